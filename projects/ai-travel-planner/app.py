@@ -1,26 +1,25 @@
-import os, math, io
+import os, io
 import streamlit as st
-from datetime import date, timedelta
+from contextlib import closing
+from datetime import date
 from typing import List, Dict, Optional
 from urllib.parse import quote, unquote
 
-from routing.matrix import distance_km
+from routing.matrix import distance_km, haversine_km
 from routing.tsp import tsp_order
-from retrieval.places import get_sample_pois
-from retrieval.places_google import (
-    get_live_pois,
-    get_place_details_bulk,
-    get_nearby_food,
-)
 from planner.schedule import schedule_day
+from planner.pipeline import stream_plan, find_lunch
+from planner.batch import preview_swaps
+from retrieval.gazetteer import suggest, resolve, by_id, place_labels, retrieval_bias
+from retrieval.places import sample_city, SAMPLES
 from utils.pdf_export import itinerary_to_pdf
+from utils.itinerary_codec import encode_itinerary, decode_itinerary
 
 st.set_page_config(page_title="AI Travel Planner", page_icon="🗺️", layout="wide")
 HAS_GMAPS = bool(os.environ.get("GOOGLE_PLACES_API_KEY") or os.environ.get("GOOGLE_MAPS_API_KEY"))
 
 # ---------- Shareable URL state (robust parsing) ----------
 ALLOWED_INTERESTS = ["landmarks","museums","nature","food","views","nightlife"]
-CITY_CHOICES = ["Las Vegas", "New York", "Tokyo", "Chicago", "San Francisco"]
 qp = st.query_params  # property, not a function
 
 def get_str(name: str, default: str) -> str:
@@ -52,156 +51,159 @@ def get_list(name: str, default_list: List[str], allowed: Optional[List[str]]=No
         vals = [v for v in vals if v in allowed]
     return vals or default_list
 
-city_default = get_str("city", "Las Vegas")
-days_default = get_int("days", 2)
-pace_default = get_str("pace", "normal")
+# Session state: the current plan is kept as a compact token (utils/itinerary_codec.py)
+if "plan" not in st.session_state:
+    st.session_state["plan"] = None
+    # A share link carries the exact plan; render it without recomputing
+    shared = get_str("plan", "")
+    if shared:
+        try:
+            decode_itinerary(shared)
+            st.session_state["plan"] = shared
+        except ValueError:
+            st.warning("Couldn't read the itinerary in this link. Generate a new one.")
+
+itin, raw_pois = decode_itinerary(st.session_state["plan"]) if st.session_state["plan"] else (None, [])
+
+def save_plan(new_itin: Dict, pois: List[Dict]):
+    token = encode_itinerary(new_itin, pois)
+    st.session_state["plan"] = token
+    st.query_params["plan"] = token
+
+city_default = itin["city"] if itin else get_str("city", "Las Vegas")
+days_default = itin["days"] if itin else get_int("days", 2)
+pace_default = itin["pace"] if itin else get_str("pace", "normal")
+start_default = date.fromisoformat(itin["start"]) if itin else date.today()
 interests_default = get_list("interests", ["landmarks","food","views"], allowed=ALLOWED_INTERESTS)
 
 # ---------- Sidebar ----------
 with st.sidebar:
     st.header("Trip details")
-    city = st.selectbox("City", CITY_CHOICES, index=(CITY_CHOICES.index(city_default) if city_default in CITY_CHOICES else 0))
-    start = st.date_input("Start date", value=date.today())
+    # Offline gazetteer (retrieval/gazetteer.py): prefix + typo-tolerant autocomplete
+    if "destination" not in st.session_state:
+        # Links name the exact place (GeoNames id, else country), not just the
+        # most populous namesake
+        country = get_str("country", "")
+        linked = by_id(get_str("place", "")) or (resolve(city_default, country) if country else None)
+        st.session_state["destination"] = linked["name"] if linked else city_default
+        st.session_state["linked_place"] = linked
+    query = st.text_input("Destination", key="destination", help="Any city; a few letters or a typo is fine")
+    matches = suggest(query) if query.strip() else []
+    linked = st.session_state["linked_place"]
+    if linked and query == linked["name"]:
+        matches = [linked] + [m for m in matches if m != linked][:len(matches) - 1]
+    if matches:
+        labels = place_labels(matches)
+        pick = st.selectbox("Matching places", range(len(matches)), format_func=labels.__getitem__)
+        place = matches[pick]
+        city = place["name"]
+    else:
+        if query.strip():
+            st.warning(f"No city found for “{query}”.")
+        place, city = None, query.strip()
+    start = st.date_input("Start date", value=start_default)
     days = st.slider("Days", 1, 7, days_default if 1 <= days_default <= 7 else 2)
     pace = st.select_slider("Pace", options=["chill","normal","packed"], value=pace_default if pace_default in ["chill","normal","packed"] else "normal")
     interests = st.multiselect("Interests", ALLOWED_INTERESTS, default=interests_default)
     use_live = st.checkbox("Use Google Places (if key available)", value=HAS_GMAPS, disabled=not HAS_GMAPS)
+    sample_key = sample_city(place) if place else None
+    if place and not (use_live and HAS_GMAPS) and not sample_key:
+        st.info(f"No sample data for {city}. Offline sample cities: {', '.join(SAMPLES)}.")
 
     # Keep URL in sync for shareable links
     st.query_params = {
     	"city": city,
+    	**({"country": place["country"]} if place else {}),
+    	**({"place": place["id"]} if place and place["id"] else {}),
     	"days": str(days),
     	"pace": pace,
     	"interests": ",".join(interests),
+    	**({"plan": st.session_state["plan"]} if st.session_state["plan"] else {}),
 	}
 
 # ---------- Global constraint ----------
 pace_to_max_km = {"chill": 8, "normal": 12, "packed": 16}
 max_walk_km = pace_to_max_km.get(pace, 12)
 
-def split_days(stops: List[Dict], num_days: int) -> List[List[Dict]]:
-    if num_days <= 0: return [stops]
-    per_day = max(2, math.ceil(len(stops)/num_days))
-    out, i = [], 0
-    for _ in range(num_days):
-        out.append(stops[i:i+per_day])
-        i += per_day
-    if out and len(out[-1]) < 2 and len(out) > 1:
-        out[-2].extend(out[-1]); out = out[:-1]
-    return out
-
 # ---------- UI actions ----------
 colA, colB, colC = st.columns([1,1,1])
 with colA:
-    generate = st.button("Generate Itinerary", type="primary")
+    generate = st.button("Generate Itinerary", type="primary", disabled=place is None,
+                         help=None if place else "Pick a destination first")
 with colB:
     export_pdf = st.button("Export to PDF", help="Generates a shareable PDF")
 with colC:
     st.caption(f"Walking limit: ≤ {max_walk_km} km/day")
 
-# Session state
-if "last_itinerary" not in st.session_state:
-    st.session_state["last_itinerary"] = None
-if "raw_pois" not in st.session_state:
-    st.session_state["raw_pois"] = []
-
 # ---------- Lunch finder ----------
 def lunch_finder(prev_stop):
-    # With key: Nearby Search around previous stop
-    if prev_stop and HAS_GMAPS:
-        candidates = get_nearby_food(prev_stop["lat"], prev_stop["lng"], limit=5)
-        return candidates[0] if candidates else None
-    # Fallback: closest sample "food" POI
-    try:
-        foodies = [p for p in st.session_state["raw_pois"] if p.get("category") == "food"]
-        if prev_stop and foodies:
-            best = min(foodies, key=lambda f: distance_km(prev_stop, f))
-            return best
-    except Exception:
-        pass
-    return None
+    return find_lunch(prev_stop, raw_pois, live=HAS_GMAPS)
 
-# ---------- Build itinerary ----------
-def build_itinerary(pois: List[Dict]) -> Dict:
-    day_lists = split_days(pois, days)
-    all_days = []
-    total_dist = 0.0
+# ---------- Day rendering ----------
+def render_schedule(sched: Dict):
+    st.markdown(f"**Walking distance (approx): {sched['total_walk_km']:.1f} km**")
 
-    for d_idx, day_stops in enumerate(day_lists):
-        # Route
-        if len(day_stops) <= 1:
-            ordered, dist_km = day_stops, 0.0
-        else:
-            home = {"name":"Hotel", "lat": day_stops[0]["lat"], "lng": day_stops[0]["lng"]}
-            ordered, dist_km = tsp_order(day_stops, distance_km, home)
+    for leg in sched["legs"]:
+        st.caption(f"Walk {leg['distance_km']} km · {leg['from']} → {leg['to']} [{leg['depart']} → {leg['arrive']}]")
 
-        # Schedule with time windows + lunch
-        the_date = (start + timedelta(days=d_idx)).isoformat()
-        sched = schedule_day(
-            date_str=the_date,
-            ordered_stops=ordered,
-            distance_fn=distance_km,
-            day_start="09:30",
-            day_end="19:00",
-            pace=pace,
-            insert_lunch=True,
-            lunch_time="13:00",
-            lunch_finder=lunch_finder
-        )
-        total_dist += sched["total_walk_km"]
-        all_days.append({"date": the_date, "route": ordered, "schedule": sched})
-
-    return {
-        "city": city, "days": days, "pace": pace, "start": start.isoformat(),
-        "max_walk_km": max_walk_km, "total_km": round(total_dist,1),
-        "days_detail": all_days
-    }
+    for s in sched["stops"]:
+        extras = []
+        if s.get("dwell_min"): extras.append(f"{s['dwell_min']} min")
+        st.markdown(f"- **{s['name']}** · {s.get('category','')} [{s['start']}–{s['end']}] {'· ' + ', '.join(extras) if extras else ''}")
 
 # ---------- Generate ----------
-if generate:
-    # 1) Retrieve POIs
-    if use_live and HAS_GMAPS:
-        pois = get_live_pois(city, interests, limit=30)
-        # Enrich with opening hours if available
-        place_ids = [p["place_id"] for p in pois if p.get("place_id")]
-        if place_ids:
-            details_map = get_place_details_bulk(place_ids)
-            for p in pois:
-                det = details_map.get(p.get("place_id"))
-                if det:
-                    p["opening_hours"] = det.get("opening_hours")
-        st.caption(f"Loaded {len(pois)} POIs from Google Places.")
+if generate and place:   # never search Places for an unresolved or empty destination
+    # Stream the pipeline: POIs show up as they're fetched and each day as soon
+    # as it's routed. Changing an input mid-run makes Streamlit rerun the script,
+    # which closes the stream and cancels the days still queued.
+    live = use_live and HAS_GMAPS
+    raw_pois, itin = [], None
+    progress = st.empty()
+    with progress.container():
+        found = st.empty()
+        day_slots = []
+        events = stream_plan(city if live else (sample_key or city), interests, live, start, days, pace, max_walk_km,
+                             lunch_finder=lunch_finder, limit=30, bias=(retrieval_bias(place) if live else None))
+        with closing(events):
+            for ev in events:
+                if ev["type"] == "pois":
+                    raw_pois.extend(ev["pois"])
+                    names = ", ".join(p["name"] for p in raw_pois[:8]) + ("…" if len(raw_pois) > 8 else "")
+                    found.caption(f"Found {len(raw_pois)} places so far: {names}")
+                elif ev["type"] == "days":
+                    for tab, the_date in zip(st.tabs([f"Day {i+1}" for i in range(len(ev["dates"]))]), ev["dates"]):
+                        with tab:
+                            slot = st.empty()
+                            slot.info(f"Routing {the_date}…")
+                            day_slots.append(slot)
+                elif ev["type"] == "day":
+                    with day_slots[ev["index"]].container():
+                        render_schedule(ev["day"]["schedule"])
+                elif ev["type"] == "done":
+                    itin = ev["itinerary"]
+    progress.empty()
+
+    if live:
+        st.caption(f"Loaded {len(raw_pois)} POIs from Google Places.")
     else:
-        pois = get_sample_pois(city, interests)
-        st.caption(f"Loaded {len(pois)} sample POIs (no API keys).")
+        st.caption(f"Loaded {len(raw_pois)} sample POIs (no API keys).")
 
-    if not pois:
+    if not itin:
         st.warning("No POIs found. Try different interests or disable Google Places.")
         st.stop()
 
-    st.session_state["raw_pois"] = pois
-    st.session_state["last_itinerary"] = build_itinerary(pois)
+    save_plan(itin, raw_pois)
 
 # ---------- Render + Swap ----------
-if st.session_state["last_itinerary"]:
-    itin = st.session_state["last_itinerary"]
+if itin:
     st.subheader(f"Itinerary for {itin['city']} · {itin['days']} day(s) · {itin['pace']} pace")
-    st.caption(f"Trip distance: {itin['total_km']} km • Constraint: ≤ {itin['max_walk_km']} km/day")
+    st.caption(f"Trip distance: {itin['total_km']} km • Constraint: ≤ {itin['max_walk_km']} km/day · Share this page's URL to share this exact plan")
 
     tabs = st.tabs([f"Day {i+1}" for i in range(len(itin["days_detail"]))])
 
     for d_idx, day in enumerate(itin["days_detail"]):
         with tabs[d_idx]:
-            sched = day["schedule"]
-            st.markdown(f"**Walking distance (approx): {sched['total_walk_km']:.1f} km**")
-
-            for leg in sched["legs"]:
-                st.caption(f"Walk {leg['distance_km']} km · {leg['from']} → {leg['to']} [{leg['depart']} → {leg['arrive']}]")
-
-            for s in sched["stops"]:
-                extras = []
-                if s.get("dwell_min"): extras.append(f"{s['dwell_min']} min")
-                st.markdown(f"- **{s['name']}** · {s.get('category','')} [{s['start']}–{s['end']}] {'· ' + ', '.join(extras) if extras else ''}")
+            render_schedule(day["schedule"])
 
             # Swap controls
             st.divider()
@@ -211,9 +213,27 @@ if st.session_state["last_itinerary"]:
                 to_replace = st.selectbox(f"Pick a stop to replace (Day {d_idx+1})", current_names, key=f"rep_{d_idx}")
                 # Candidates: any POI not already in the day's schedule by name
                 current_set = set(current_names)
-                candidates = [p for p in st.session_state["raw_pois"] if p["name"] not in current_set]
+                candidates = [p for p in raw_pois if p["name"] not in current_set]
                 cand_names = [c["name"] for c in candidates] or ["(no candidates)"]
                 replacement = st.selectbox("Replace with", cand_names, key=f"cand_{d_idx}")
+
+                # Preview every candidate in one vectorized pass. This keeps the current order and
+                # straight-line walks, while Swap re-routes the day, so it's shown as an estimate.
+                slot = next((i for i, r in enumerate(day["route"]) if r["name"] == to_replace), None)
+                preview = preview_swaps(day["route"], slot, candidates, haversine_km, day["date"], pace=itin["pace"]) if candidates and slot is not None else None
+                if preview:
+                    n_route = len(day["route"])
+                    def fmt(i):
+                        end_min = int(preview["end_min"][i])
+                        return f"{preview['n_visited'][i]}/{n_route} stops · {preview['walk_km'][i]:.1f} km · done {end_min // 60:02d}:{end_min % 60:02d}"
+                    pick = cand_names.index(replacement) + 1
+                    st.caption(f"Estimate in the current order (Swap re-routes the day): now {fmt(0)} → with {replacement}: {fmt(pick)}")
+                    # Rank only places that aren't already on another day, against keeping the stop
+                    elsewhere = {s["name"] for o_idx, other in enumerate(itin["days_detail"]) if o_idx != d_idx for s in other["route"]}
+                    rows = [0] + [i + 1 for i, c in enumerate(candidates) if c["name"] not in elsewhere]
+                    best = min(rows, key=lambda i: (-preview["n_visited"][i], round(preview["walk_km"][i], 3), preview["end_min"][i]))
+                    if best > 0 and best != pick:
+                        st.caption(f"Best fit for this slot (estimate): {candidates[best - 1]['name']} ({fmt(best)})")
                 if st.button("Swap and re-route this day", key=f"swap_{d_idx}", disabled=(replacement == "(no candidates)")):
                     chosen = next((c for c in candidates if c["name"] == replacement), None)
                     if chosen:
@@ -235,7 +255,7 @@ if st.session_state["last_itinerary"]:
                                 distance_fn=distance_km,
                                 day_start="09:30",
                                 day_end="19:00",
-                                pace=pace,
+                                pace=itin["pace"],
                                 insert_lunch=True,
                                 lunch_time="13:00",
                                 lunch_finder=lunch_finder
@@ -243,14 +263,13 @@ if st.session_state["last_itinerary"]:
                             itin["days_detail"][d_idx]["route"] = new_route
                             itin["days_detail"][d_idx]["schedule"] = new_sched
                             itin["total_km"] = round(sum(d["schedule"]["total_walk_km"] for d in itin["days_detail"]), 1)
-                            st.session_state["last_itinerary"] = itin
+                            save_plan(itin, raw_pois)
                             st.success("Day updated. Scroll up to see the new order and times.")
             else:
                 st.caption("No swappable stops on this day.")
 
 # ---------- Export PDF ----------
 if export_pdf:
-    itin = st.session_state.get("last_itinerary")
     if not itin:
         st.warning("Generate an itinerary first.")
     else:
@@ -0,0 +1,201 @@
+"""
+Concurrent end-to-end load driver for the planner.
+
+Runs N planning sessions (retrieval -> details -> routing -> scheduling, the
+same path as the Generate button) against the local Google Maps stand-in and
+reports generate latency and time-to-first-day percentiles, throughput and
+outbound call counts.
+
+    python -m loadtest.driver --sessions 40 --concurrency 8 --days 3
+
+By default a mock server is started in-process, a fresh cache directory is
+used and every session plans a city of its own ("Tokyo 1", "Tokyo 2", ...;
+the mock makes distinct places for each), so every session runs cold. With
+--repeat-cities sessions share the plain city names and later ones hit the
+file cache; cold (first use of a city) and warm sessions are then reported
+separately. Pass --cache-dir to reuse a cache between runs, or --server to
+target an already running mock.
+"""
+import argparse, json, math, os, random, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import partial
+from typing import Dict, List, Optional
+from urllib.request import Request, urlopen
+
+from loadtest.mock_gmaps import start_server, add_server_args
+
+DEFAULT_CITIES = ["Las Vegas", "New York", "Tokyo", "Chicago", "San Francisco"]
+DEFAULT_INTERESTS = ["landmarks", "food", "views"]
+PACE_TO_MAX_KM = {"chill": 8, "normal": 12, "packed": 16}
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def _server_call(base_url: str, path: str, method: str = "GET") -> Dict:
+    with urlopen(Request(base_url + path, method=method), timeout=10) as r:
+        return json.loads(r.read().decode())
+
+def run_session(city: str, interests: List[str], days: int, pace: str) -> Dict:
+    # Imported lazily: these modules read the API key/base URL at import time
+    from planner.pipeline import stream_plan, find_lunch
+
+    t0 = time.perf_counter()
+    pois: List[Dict] = []
+    first_day, itin = None, None
+    events = stream_plan(
+        city, interests, live=True, start=date.today(), days=days, pace=pace,
+        max_walk_km=PACE_TO_MAX_KM.get(pace, 12),
+        lunch_finder=partial(find_lunch, pois=pois, live=True), limit=30
+    )
+    for ev in events:
+        if ev["type"] == "pois":
+            pois.extend(ev["pois"])
+        elif ev["type"] == "day" and first_day is None:
+            first_day = time.perf_counter() - t0
+        elif ev["type"] == "done":
+            itin = ev["itinerary"]
+    if not itin:
+        return {"ok": False, "city": city, "seconds": time.perf_counter() - t0, "error": "no POIs"}
+    return {
+        "ok": True, "city": city, "seconds": time.perf_counter() - t0, "first_day_s": first_day,
+        "stops": sum(len(d["schedule"]["stops"]) for d in itin["days_detail"]),
+    }
+
+def _safe_session(*args) -> Dict:
+    try:
+        return run_session(*args)
+    except Exception as e:  # keep the run going; report failures at the end
+        return {"ok": False, "seconds": 0.0, "error": f"{type(e).__name__}: {e}"}
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {
+        "n": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+def run_load(
+    sessions: int,
+    concurrency: int,
+    days: int,
+    pace: str,
+    cities: List[str],
+    interests: List[str],
+    server_url: str,
+    seed: int = 0,
+    repeat_cities: bool = False
+) -> Dict:
+    rng = random.Random(seed)
+    names = [rng.choice(cities) for _ in range(sessions)]
+    if not repeat_cities:
+        names = [f"{c} {i + 1}" for i, c in enumerate(names)]
+    plans = [(c, interests, days, pace) for c in names]
+    cold = [c not in names[:i] for i, c in enumerate(names)]
+
+    _server_call(server_url, "/__reset", method="POST")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(lambda p: _safe_session(*p), plans))
+    wall = time.perf_counter() - t0
+    calls = _server_call(server_url, "/__stats")
+
+    ok = [r for r in results if r["ok"]]
+    lat = [r["seconds"] for r in ok]
+    first = [r["first_day_s"] for r in ok]
+    by_cache = {
+        label: _latency_summary([r["seconds"] for r, c in zip(results, cold) if r["ok"] and c == want])
+        for label, want in (("cold", True), ("warm", False))
+    }
+    outbound = {k: v for k, v in calls.items() if k in ("textsearch", "details", "nearbysearch", "distancematrix")}
+    total_calls = sum(outbound.values())
+    return {
+        "sessions": sessions, "concurrency": concurrency, "ok": len(ok), "failed": sessions - len(ok),
+        "errors": sorted({r["error"] for r in results if not r["ok"]}),
+        "wall_s": round(wall, 3),
+        "throughput_per_s": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency_s": {
+            "p50": round(percentile(lat, 50), 3),
+            "p95": round(percentile(lat, 95), 3),
+            "p99": round(percentile(lat, 99), 3),
+            "max": round(max(lat), 3) if lat else 0.0,
+        },
+        "first_day_s": {
+            "p50": round(percentile(first, 50), 3),
+            "p95": round(percentile(first, 95), 3),
+        },
+        "by_cache": by_cache,
+        "outbound_calls": outbound,
+        "outbound_total": total_calls,
+        "calls_per_session": round(total_calls / sessions, 1) if sessions else 0.0,
+        "injected": {k: calls.get(k, 0) for k in ("errors", "over_quota")},
+    }
+
+def print_report(rep: Dict):
+    print(f"Sessions: {rep['ok']}/{rep['sessions']} ok · concurrency {rep['concurrency']} · wall {rep['wall_s']} s")
+    for err in rep["errors"]:
+        print(f"  failure: {err}")
+    lat = rep["latency_s"]
+    print(f"Generate latency: p50 {lat['p50']} s · p95 {lat['p95']} s · p99 {lat['p99']} s · max {lat['max']} s")
+    for label, lc in rep["by_cache"].items():
+        if lc["n"]:
+            print(f"  {label} cache ({lc['n']}): p50 {lc['p50']} s · p95 {lc['p95']} s · max {lc['max']} s")
+    fd = rep["first_day_s"]
+    print(f"Time to first day: p50 {fd['p50']} s · p95 {fd['p95']} s")
+    print(f"Throughput: {rep['throughput_per_s']} sessions/s")
+    per_ep = " · ".join(f"{k} {v}" for k, v in sorted(rep["outbound_calls"].items())) or "none"
+    print(f"Outbound calls: {rep['outbound_total']} ({rep['calls_per_session']}/session) — {per_ep}")
+    inj = rep["injected"]
+    print(f"Injected faults: {inj['errors']} errors · {inj['over_quota']} over-quota")
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Concurrent planner load test against a mock Google Maps")
+    ap.add_argument("--sessions", type=int, default=20)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--days", type=int, default=3)
+    ap.add_argument("--pace", default="normal", choices=list(PACE_TO_MAX_KM))
+    ap.add_argument("--cities", default=",".join(DEFAULT_CITIES), help="comma-separated; sessions pick at random")
+    ap.add_argument("--repeat-cities", action="store_true",
+                    help="let sessions share city names (and so the cache) instead of each planning its own")
+    ap.add_argument("--interests", default=",".join(DEFAULT_INTERESTS))
+    ap.add_argument("--server", default=None, help="URL of a running mock; default starts one in-process")
+    ap.add_argument("--cache-dir", default=None, help="reuse this cache dir (default: fresh temp dir)")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    add_server_args(ap)
+    args = ap.parse_args(argv)
+
+    srv = None
+    if args.server:
+        server_url = args.server.rstrip("/")
+    else:
+        srv = start_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                           error_rate=args.error_rate, quota_rate=args.quota_rate, seed=args.seed)
+        server_url = srv.url
+
+    # Must be set before the planner modules are imported
+    os.environ["GOOGLE_MAPS_BASE_URL"] = server_url
+    os.environ.setdefault("GOOGLE_MAPS_API_KEY", "mock")
+    os.environ["PLANNER_CACHE_DIR"] = args.cache_dir or tempfile.mkdtemp(prefix="planner-load-")
+
+    rep = run_load(
+        sessions=args.sessions, concurrency=args.concurrency, days=args.days, pace=args.pace,
+        cities=[c.strip() for c in args.cities.split(",") if c.strip()],
+        interests=[i.strip() for i in args.interests.split(",") if i.strip()],
+        server_url=server_url, seed=args.seed, repeat_cities=args.repeat_cities
+    )
+    if srv:
+        srv.shutdown()
+    if args.json:
+        print(json.dumps(rep, indent=2))
+    else:
+        print_report(rep)
+    return 0 if rep["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
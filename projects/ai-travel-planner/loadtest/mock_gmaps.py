@@ -0,0 +1,269 @@
+"""
+Local stand-in for the Google Maps web services the planner calls
+(Places textsearch/details/nearbysearch and Distance Matrix).
+
+Data is synthetic but deterministic: the same query always returns the same
+places, so runs are comparable. Latency, error rate and quota responses are
+configurable. Point the app at it with:
+
+    GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8765 GOOGLE_MAPS_API_KEY=mock
+
+Run standalone:  python -m loadtest.mock_gmaps --port 8765 --latency-ms 80
+Counters:        GET /__stats   (POST /__reset to zero them)
+"""
+import argparse, hashlib, json, math, random, re, threading, time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+ENDPOINTS = {
+    "/maps/api/place/textsearch/json": "textsearch",
+    "/maps/api/place/details/json": "details",
+    "/maps/api/place/nearbysearch/json": "nearbysearch",
+    "/maps/api/distancematrix/json": "distancematrix",
+}
+
+NOUNS = {
+    "landmarks": ["Monument", "Old Town Square", "Clock Tower", "Cathedral", "Castle", "Memorial"],
+    "museums": ["Museum of Art", "History Museum", "Science Center", "Gallery", "Maritime Museum"],
+    "nature": ["Botanical Garden", "Riverside Park", "City Park", "Nature Reserve", "Rose Garden"],
+    "food": ["Bistro", "Noodle House", "Market Hall", "Steakhouse", "Taqueria", "Bakery"],
+    "views": ["Observation Deck", "Skyline Lookout", "Hilltop Viewpoint", "Rooftop Terrace"],
+    "nightlife": ["Jazz Bar", "Cocktail Lounge", "Brewpub", "Night Club", "Wine Bar"],
+}
+
+RESULTS_PER_QUERY = 20
+WALK_DETOUR = 1.25     # street distance vs great-circle
+WALK_MPS = 4.5 / 3.6   # 4.5 km/h
+
+def _rng(*parts) -> random.Random:
+    digest = hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+def _place_id(*parts) -> str:
+    return "mock_" + hashlib.sha1("|".join(str(p) for p in parts).encode()).hexdigest()[:20]
+
+def _parse_latlng(s: str) -> Tuple[float, float]:
+    lat, lng = s.split(",")
+    return float(lat), float(lng)
+
+def _haversine_m(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    # Own copy: importing routing.matrix here would freeze its env-derived config
+    phi1, phi2 = math.radians(a[0]), math.radians(b[0])
+    dphi, dlmb = phi2 - phi1, math.radians(b[1] - a[1])
+    h = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlmb/2)**2
+    return 2 * 6371000.0 * math.asin(math.sqrt(h))
+
+def city_center(city: str) -> Tuple[float, float]:
+    rng = _rng("city", city.strip().lower())
+    return round(rng.uniform(-45.0, 60.0), 4), round(rng.uniform(-170.0, 170.0), 4)
+
+# ---------- Synthetic payloads ----------
+def textsearch(params: Dict[str, str]) -> Dict:
+    query = params.get("query", "")
+    m = re.match(r"best (\w+) in (.+)", query)
+    interest, city = (m.group(1), m.group(2)) if m else ("landmarks", query or "Nowhere")
+    if params.get("location"):
+        c_lat, c_lng = _parse_latlng(params["location"])
+    else:
+        c_lat, c_lng = city_center(city)
+    rng = _rng("textsearch", city, interest, params.get("type"), params.get("keyword"))
+    nouns = NOUNS.get(interest, NOUNS["landmarks"])
+    results = []
+    for i in range(RESULTS_PER_QUERY):
+        lat = c_lat + rng.uniform(-0.03, 0.03)
+        lng = c_lng + rng.uniform(-0.04, 0.04)
+        results.append({
+            "name": f"{city} {nouns[i % len(nouns)]} {i // len(nouns) + 1}",
+            "geometry": {"location": {"lat": round(lat, 6), "lng": round(lng, 6)}},
+            "rating": round(rng.uniform(3.6, 4.9), 1),
+            "price_level": rng.randint(1, 4) if interest in ("food", "nightlife") else None,
+            "place_id": _place_id(city, interest, i),
+            "formatted_address": f"{rng.randint(1, 999)} Main St, {city}",
+            "opening_hours": {"open_now": rng.random() > 0.2},
+        })
+    return {"status": "OK", "results": results}
+
+def details(params: Dict[str, str]) -> Dict:
+    pid = params.get("place_id", "")
+    if not pid:
+        return {"status": "INVALID_REQUEST"}
+    rng = _rng("details", pid)
+    open_h, close_h = rng.randint(7, 11), rng.randint(17, 23)
+    closed_day = rng.choice([None, None, 0, 1])  # some places shut one weekday
+    periods = []
+    for day in range(7):
+        if day == closed_day:
+            continue
+        periods.append({
+            "open": {"day": day, "time": f"{open_h:02d}{rng.choice([0, 30]):02d}"},
+            "close": {"day": day, "time": f"{close_h:02d}00"},
+        })
+    return {"status": "OK", "result": {"opening_hours": {"open_now": True, "periods": periods}}}
+
+def nearbysearch(params: Dict[str, str]) -> Dict:
+    try:
+        c_lat, c_lng = _parse_latlng(params.get("location", ""))
+    except ValueError:
+        return {"status": "INVALID_REQUEST", "results": []}
+    radius_deg = float(params.get("radius", 1200)) / 111_000.0
+    # Snap to ~100 m so nearby lookups from the same spot agree
+    rng = _rng("nearby", round(c_lat, 3), round(c_lng, 3), params.get("type"))
+    results = []
+    for i in range(10):
+        noun = NOUNS["food"][i % len(NOUNS["food"])]
+        results.append({
+            "name": f"Corner {noun} {i + 1}",
+            "geometry": {"location": {
+                "lat": round(c_lat + rng.uniform(-radius_deg, radius_deg), 6),
+                "lng": round(c_lng + rng.uniform(-radius_deg, radius_deg), 6),
+            }},
+            "rating": round(rng.uniform(3.5, 4.9), 1),
+            "price_level": rng.randint(1, 3),
+            "place_id": _place_id("nearby", round(c_lat, 3), round(c_lng, 3), i),
+            "vicinity": f"{rng.randint(1, 999)} Side St",
+        })
+    return {"status": "OK", "results": results}
+
+def distancematrix(params: Dict[str, str]) -> Dict:
+    try:
+        origins = [_parse_latlng(o) for o in params.get("origins", "").split("|")]
+        dests = [_parse_latlng(d) for d in params.get("destinations", "").split("|")]
+    except ValueError:
+        return {"status": "INVALID_REQUEST", "rows": []}
+    rows = []
+    for o in origins:
+        elements = []
+        for d in dests:
+            meters = int(_haversine_m(o, d) * WALK_DETOUR)
+            elements.append({
+                "status": "OK",
+                "distance": {"value": meters, "text": f"{meters / 1000:.1f} km"},
+                "duration": {"value": int(meters / WALK_MPS), "text": f"{int(meters / WALK_MPS / 60)} mins"},
+            })
+        rows.append({"elements": elements})
+    return {"status": "OK", "rows": rows}
+
+HANDLERS = {
+    "textsearch": textsearch,
+    "details": details,
+    "nearbysearch": nearbysearch,
+    "distancematrix": distancematrix,
+}
+
+# ---------- HTTP plumbing ----------
+class MockGMapsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, quota_rate=0.0, seed=0):
+        super().__init__(addr, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Counter = Counter()
+
+    def roll(self) -> Tuple[float, float]:
+        with self._lock:
+            return self._rng.random(), self._rng.gauss(0.0, 1.0)
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockGMapsServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, code: int, payload: Dict):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/__reset":
+            self.server.reset()
+            return self._send(200, {"status": "OK"})
+        self._send(404, {"status": "NOT_FOUND"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/__stats":
+            return self._send(200, self.server.snapshot())
+        name = ENDPOINTS.get(url.path)
+        if not name:
+            return self._send(404, {"status": "NOT_FOUND"})
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        srv = self.server
+        srv.count(name)
+
+        fail_roll, jitter = srv.roll()
+        delay_ms = max(0.0, srv.latency_ms + jitter * srv.jitter_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000.0)
+
+        if not params.get("key"):
+            srv.count("denied")
+            return self._send(200, {"status": "REQUEST_DENIED", "error_message": "Missing key."})
+        if fail_roll < srv.error_rate:
+            srv.count("errors")
+            return self._send(500, {"status": "UNKNOWN_ERROR"})
+        if fail_roll < srv.error_rate + srv.quota_rate:
+            # Google answers quota exhaustion with HTTP 200 and an empty payload
+            srv.count("over_quota")
+            return self._send(200, {"status": "OVER_QUERY_LIMIT", "results": [], "rows": [],
+                                    "error_message": "You have exceeded your daily request quota."})
+        self._send(200, HANDLERS[name](params))
+
+def start_server(host: str = "127.0.0.1", port: int = 0, **config) -> MockGMapsServer:
+    """Start the mock in a daemon thread. port=0 picks a free port; see server.url."""
+    srv = MockGMapsServer((host, port), **config)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+def add_server_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--latency-ms", type=float, default=60.0, help="mean added latency per call")
+    ap.add_argument("--jitter-ms", type=float, default=20.0, help="std-dev of latency jitter")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with HTTP 500")
+    ap.add_argument("--quota-rate", type=float, default=0.0, help="fraction of calls answered OVER_QUERY_LIMIT")
+    ap.add_argument("--seed", type=int, default=0)
+
+def main(argv: List[str] = None):
+    ap = argparse.ArgumentParser(description="Local Google Maps stand-in")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    add_server_args(ap)
+    args = ap.parse_args(argv)
+    srv = MockGMapsServer((args.host, args.port), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, quota_rate=args.quota_rate, seed=args.seed)
+    print(f"Mock Google Maps listening on {srv.url}")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+if __name__ == "__main__":
+    main()
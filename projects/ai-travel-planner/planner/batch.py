@@ -0,0 +1,162 @@
+"""
+Vectorized schedule evaluation: score many candidate orderings of a day's
+stops at once with the same rules as schedule_day (walk, lunch, opening
+windows, dwell trimming, end-of-day cut-off), without building the schedule.
+Times are minutes since midnight.
+"""
+from typing import List, Dict, Callable, Optional, Sequence
+
+import numpy as np
+
+from planner.schedule import parse_hhmm, walking_minutes_for_km, stop_dwell_minutes, stop_window
+
+MIN_VISIT_MIN = 20   # schedule_day drops a stop rather than visit it for less
+LUNCH_MIN = 45
+
+def hhmm_to_minutes(s: str) -> int:
+    h, m = parse_hhmm(s)
+    return h * 60 + m
+
+def day_arrays(
+    stops: List[Dict],
+    distance_fn: Callable,
+    date_str: str,
+    pace: str = "normal",
+    day_end: str = "19:00"
+) -> Dict[str, np.ndarray]:
+    """
+    Precompute everything evaluate_orderings needs for a set of stops:
+    dist_km/travel_min (n x n), dwell_min, open_min, close_min (n,).
+    """
+    n = len(stops)
+    dist = np.zeros((n, n))
+    for i in range(n):
+        for j in range(n):
+            if i != j:
+                dist[i, j] = distance_fn(stops[i], stops[j])
+    travel = np.vectorize(walking_minutes_for_km, otypes=[np.int64])(dist) if n else np.zeros((0, 0), np.int64)
+
+    end_min = hhmm_to_minutes(day_end)
+    open_min, close_min = np.zeros(n), np.zeros(n)
+    for i, stop in enumerate(stops):
+        o, c = (hhmm_to_minutes(t) for t in stop_window(stop, date_str))
+        open_min[i], close_min[i] = o, (c if c > o else end_min)  # past midnight -> clamp
+    dwell = np.array([stop_dwell_minutes(s, pace) for s in stops], dtype=float)
+    return {"dist_km": dist, "travel_min": travel, "dwell_min": dwell, "open_min": open_min, "close_min": close_min}
+
+def evaluate_orderings(
+    perms,
+    travel_min,
+    dwell_min,
+    open_min,
+    close_min,
+    dist_km=None,
+    day_start="09:30",
+    day_end="19:00",
+    insert_lunch: bool = True,
+    lunch_time="13:00"
+) -> Dict:
+    """
+    Simulate a day for every row of `perms` (C x K stop indices, -1 = empty
+    slot) in one pass. `day_start` may be a single "HH:MM"/minutes value or
+    one per candidate, for "what if we start later" comparisons.
+
+    Returns per-candidate metrics (arrive/depart/visited are C x K, NaN where
+    a stop isn't reached) plus `best`: most stops kept, then least walking,
+    then earliest finish.
+    """
+    perms = np.atleast_2d(np.asarray(perms, dtype=np.int64))
+    C, K = perms.shape
+    travel_min = np.asarray(travel_min, dtype=float)
+    dist_km = np.zeros_like(travel_min) if dist_km is None else np.asarray(dist_km, dtype=float)
+    dwell_min, open_min, close_min = (np.asarray(a, dtype=float) for a in (dwell_min, open_min, close_min))
+
+    as_min = lambda t: hhmm_to_minutes(t) if isinstance(t, str) else t
+    start = np.array([as_min(t) for t in np.broadcast_to(np.asarray(day_start, dtype=object), (C,))], dtype=float)
+    end, lunch_at = float(as_min(day_end)), float(as_min(lunch_time))
+
+    valid = perms >= 0
+    idx = np.where(valid, perms, 0)
+
+    cur = start.copy()
+    prev = np.full(C, -1, dtype=np.int64)
+    done = np.zeros(C, dtype=bool)
+    lunch_taken = np.full(C, not insert_lunch)
+    lunch_start = np.full(C, np.nan)
+    walk_km = np.zeros(C)
+    idle = np.zeros(C)
+    arrive = np.full((C, K), np.nan)
+    depart = np.full((C, K), np.nan)
+    visited = np.zeros((C, K), dtype=bool)
+
+    for k in range(K):
+        s = idx[:, k]
+        live = valid[:, k] & ~done
+
+        # Walk from the last stop actually visited
+        moving = live & (prev >= 0)
+        from_ = np.where(moving, prev, 0)
+        cur += np.where(moving, travel_min[from_, s], 0.0)
+        walk_km += np.where(moving, dist_km[from_, s], 0.0)
+
+        lunch = live & ~lunch_taken & (cur >= lunch_at)
+        lunch_start = np.where(lunch, cur, lunch_start)
+        cur += np.where(lunch, LUNCH_MIN, 0.0)
+        lunch_taken |= lunch
+
+        arrive[:, k] = np.where(live, cur, np.nan)
+        wait = np.where(live, np.maximum(open_min[s] - cur, 0.0), 0.0)
+        idle += wait
+        cur += wait
+
+        close = close_min[s]
+        trimmed = cur + dwell_min[s] > close
+        dwell = np.where(trimmed, np.floor(close - cur), dwell_min[s])
+        ok = live & (cur < close) & ~(trimmed & (dwell < MIN_VISIT_MIN))
+
+        depart[:, k] = np.where(ok, cur + dwell, np.nan)
+        cur = np.where(ok, cur + dwell, cur)
+        prev = np.where(ok, s, prev)
+        visited[:, k] = ok
+        done |= ok & (cur >= end)
+
+    n_visited = visited.sum(axis=1)
+    dropped = valid.sum(axis=1) - n_visited
+    best = int(np.lexsort((cur, np.round(walk_km, 3), -n_visited))[0]) if C else -1
+    return {
+        "best": best,
+        "order": perms[best] if C else perms,
+        "arrive_min": arrive,
+        "depart_min": depart,
+        "visited": visited,
+        "n_visited": n_visited,
+        "dropped": dropped,
+        "idle_min": idle,
+        "walk_km": walk_km,
+        "end_min": cur,
+        "lunch_min": lunch_start,
+    }
+
+def preview_swaps(
+    route: List[Dict],
+    slot: int,
+    candidates: Sequence[Dict],
+    distance_fn: Callable,
+    date_str: str,
+    pace: str = "normal",
+    day_start="09:30",
+    day_end="19:00"
+) -> Optional[Dict]:
+    """
+    Score replacing route[slot] with each candidate, keeping the current order.
+    Row 0 is the unchanged route, row i+1 uses candidates[i].
+    """
+    if not route or not 0 <= slot < len(route):
+        return None
+    nodes = list(route) + list(candidates)
+    arrays = day_arrays(nodes, distance_fn, date_str, pace, day_end)
+    base = np.arange(len(route))
+    perms = np.tile(base, (len(candidates) + 1, 1))
+    perms[1:, slot] = len(route) + np.arange(len(candidates))
+    return evaluate_orderings(perms, arrays["travel_min"], arrays["dwell_min"], arrays["open_min"],
+                              arrays["close_min"], dist_km=arrays["dist_km"], day_start=day_start, day_end=day_end)
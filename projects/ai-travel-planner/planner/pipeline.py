@@ -0,0 +1,306 @@
+import math, os, sys, threading, time, types
+import multiprocessing as mp
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
+from typing import List, Dict, Callable, Optional, Tuple, Iterator
+
+from routing.matrix import distance_km, prefetch_distances, flush_distances
+from routing.tsp import distance_matrix, path_meters, solve_order
+from retrieval.places import get_sample_pois
+from retrieval.places_google import (
+    iter_live_pois,
+    get_place_details_bulk,
+    get_nearby_food,
+)
+from planner.schedule import schedule_day
+
+# Solver budget for a trip, shared out across days as time limits. The clock
+# starts once every day's distance matrix is in, so network time isn't in it.
+PLAN_DEADLINE_S = float(os.environ.get("PLANNER_DEADLINE_S") or 8.0)
+# Headroom on top of the solver limit for IPC
+SOLVE_GRACE_S = 2.0
+MIN_SOLVE_S = 0.2
+MAX_SOLVER_WORKERS = 7
+# Workers are started (and import OR-tools) once, before any solve is timed
+WORKER_START_TIMEOUT_S = 60.0
+
+_SOLVER_POOL = None
+_SOLVER_WORKERS = 1
+_POOL_LOCK = threading.Lock()
+
+def _warm_worker() -> int:
+    import routing.tsp  # noqa: F401  (pulls in OR-tools)
+    return os.getpid()
+
+@contextmanager
+def _plain_main():
+    """
+    Spawned workers re-import the parent's __main__. Under Streamlit that is
+    app.py, so every worker would run the whole UI script before solving
+    anything; hide it while the workers start. Solves only need routing.tsp.
+    """
+    main = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+def _start_process_pool(workers: int) -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+    try:
+        # spawn launches every worker on the first submit
+        with _plain_main():
+            warm = [pool.submit(_warm_worker) for _ in range(workers)]
+        done, pending = wait(warm, timeout=WORKER_START_TIMEOUT_S)
+        if pending:
+            raise TimeoutError("solver workers did not start")
+        for f in done:
+            f.result()
+    except Exception:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    return pool
+
+def _solver_pool():
+    """
+    Shared pool for OR-tools solves. OR-tools holds the GIL while solving, so
+    processes are what actually run days side by side; fall back to a thread
+    pool where processes aren't available. The first call starts the workers
+    and waits for them, so call it before starting any solve deadline.
+    """
+    global _SOLVER_POOL, _SOLVER_WORKERS
+    with _POOL_LOCK:
+        if _SOLVER_POOL is None:
+            _SOLVER_WORKERS = max(1, min(MAX_SOLVER_WORKERS, os.cpu_count() or 1))
+            try:
+                _SOLVER_POOL = _start_process_pool(_SOLVER_WORKERS)
+            except (OSError, ImportError, NotImplementedError, TimeoutError, BrokenProcessPool):
+                _SOLVER_POOL = ThreadPoolExecutor(max_workers=_SOLVER_WORKERS)
+        return _SOLVER_POOL
+
+def _drop_broken_pool(pool):
+    global _SOLVER_POOL
+    with _POOL_LOCK:
+        if _SOLVER_POOL is pool:
+            _SOLVER_POOL = ThreadPoolExecutor(max_workers=_SOLVER_WORKERS)
+
+def day_matrix(day_stops: List[Dict]) -> List[List[int]]:
+    """
+    Walking distances (meters) between a day's stops, with a hotel at the first
+    stop as node 0. This is the network-bound part of routing when live.
+    """
+    if len(day_stops) <= 1:
+        return []
+    home = {"name":"Hotel", "lat": day_stops[0]["lat"], "lng": day_stops[0]["lng"]}
+    nodes = [home] + day_stops
+    prefetch_distances(nodes)
+    return distance_matrix(nodes, distance_km)
+
+def submit_solve(matrix: List[List[int]], deadline: float, waves: int = 1) -> Tuple:
+    """
+    Start ordering a day_matrix on the solver pool, to finish by `deadline`
+    (time.monotonic()). The time left is split over `waves` rounds of solves
+    when there are more days than solver workers. Returns a handle for
+    collect_route; cancel handle[1] to drop a solve that hasn't started.
+    """
+    limit = max(MIN_SOLVE_S, (deadline - time.monotonic()) / max(1, waves))
+    pool = _solver_pool()
+    try:
+        return pool, pool.submit(solve_order, matrix, limit), limit
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        pool = _solver_pool()
+        return pool, pool.submit(solve_order, matrix, limit), limit
+
+def collect_route(day_stops: List[Dict], matrix: List[List[int]], solve: Tuple, deadline: float) -> Tuple[List[Dict], float]:
+    """Wait for a submit_solve result; past the deadline the stops keep their given order."""
+    pool, fut, limit = solve
+    nodes = [None] + day_stops   # node 0 is the hotel
+    try:
+        order, total_m = fut.result(timeout=max(0.0, deadline + SOLVE_GRACE_S - time.monotonic()))
+    except TimeoutError:
+        fut.cancel()
+        order = list(range(1, len(nodes)))
+        total_m = path_meters(matrix, order)
+    except BrokenProcessPool:
+        _drop_broken_pool(pool)
+        order, total_m = solve_order(matrix, limit)
+    return [nodes[i] for i in order], total_m / 1000.0
+
+def route_day(day_stops: List[Dict], matrix: List[List[int]], deadline: float, waves: int = 1) -> Tuple[List[Dict], float]:
+    """Order one day's stops over its day_matrix by `deadline` (see submit_solve)."""
+    if len(day_stops) <= 1:
+        return day_stops, 0.0
+    return collect_route(day_stops, matrix, submit_solve(matrix, deadline, waves), deadline)
+
+def split_days(stops: List[Dict], num_days: int) -> List[List[Dict]]:
+    if num_days <= 0: return [stops]
+    per_day = max(2, math.ceil(len(stops)/num_days))
+    out, i = [], 0
+    for _ in range(num_days):
+        out.append(stops[i:i+per_day])
+        i += per_day
+    if out and len(out[-1]) < 2 and len(out) > 1:
+        out[-2].extend(out[-1]); out = out[:-1]
+    return out
+
+def iter_pois(city: str, interests: List[str], live: bool, limit: int = 30, bias: Optional[Dict] = None) -> Iterator[List[Dict]]:
+    """
+    Yield POI batches as they are retrieved, enriched with opening hours when live.
+    bias is an optional Places location bias (see retrieval.gazetteer.retrieval_bias).
+    """
+    if not live:
+        yield get_sample_pois(city, interests)
+        return
+    for batch in iter_live_pois(city, interests, limit=limit, bias=bias):
+        place_ids = [p["place_id"] for p in batch if p.get("place_id")]
+        if place_ids:
+            details_map = get_place_details_bulk(place_ids)
+            for p in batch:
+                det = details_map.get(p.get("place_id"))
+                if det:
+                    p["opening_hours"] = det.get("opening_hours")
+        yield batch
+
+def fetch_pois(city: str, interests: List[str], live: bool, limit: int = 30, bias: Optional[Dict] = None) -> Tuple[List[Dict], str]:
+    """
+    Retrieve POIs for a city, enriched with opening hours when live.
+    Returns (pois, source) where source is "google" or "sample".
+    """
+    pois = [p for batch in iter_pois(city, interests, live, limit, bias) for p in batch]
+    return pois, ("google" if live else "sample")
+
+def find_lunch(prev_stop: Optional[Dict], pois: List[Dict], live: bool) -> Optional[Dict]:
+    # With key: Nearby Search around previous stop
+    if prev_stop and live:
+        candidates = get_nearby_food(prev_stop["lat"], prev_stop["lng"], limit=5)
+        return candidates[0] if candidates else None
+    # Fallback: closest "food" POI we already have
+    try:
+        foodies = [p for p in pois if p.get("category") == "food"]
+        if prev_stop and foodies:
+            return min(foodies, key=lambda f: distance_km(prev_stop, f))
+    except Exception:
+        pass
+    return None
+
+def iter_days(
+    pois: List[Dict],
+    start: date,
+    days: int,
+    pace: str,
+    lunch_finder: Optional[Callable] = None,
+    deadline_s: float = PLAN_DEADLINE_S
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Route all days at once and yield (day_index, day) as each one is routed and
+    scheduled, in completion order. Distance matrices are fetched first; the
+    solve deadline starts after them. Closing the generator early cancels the
+    solves still queued on the shared solver pool; ones already running stop
+    at the deadline.
+    """
+    day_lists = split_days(pois, days)
+    _solver_pool()
+    waves = math.ceil(len(day_lists) / _SOLVER_WORKERS)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(day_lists))) as ex:
+        matrices = list(ex.map(day_matrix, day_lists))
+    deadline = time.monotonic() + deadline_s
+    solves = {d_idx: submit_solve(matrix, deadline, waves)
+              for d_idx, (stops, matrix) in enumerate(zip(day_lists, matrices)) if len(stops) > 1}
+    try:
+        ready = [d_idx for d_idx in range(len(day_lists)) if d_idx not in solves]
+        pending = {solve[1]: d_idx for d_idx, solve in solves.items()}
+        while ready or pending:
+            if not ready:
+                done, _ = wait(pending, timeout=max(0.0, deadline + SOLVE_GRACE_S - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+                # Nothing done past the deadline: the rest keep their given order
+                ready = [pending.pop(f) for f in (done or list(pending))]
+            d_idx = ready.pop(0)
+            stops = day_lists[d_idx]
+            ordered = collect_route(stops, matrices[d_idx], solves[d_idx], deadline)[0] if d_idx in solves else stops
+            # Schedule with time windows + lunch
+            the_date = (start + timedelta(days=d_idx)).isoformat()
+            sched = schedule_day(
+                date_str=the_date,
+                ordered_stops=ordered,
+                distance_fn=distance_km,
+                day_start="09:30",
+                day_end="19:00",
+                pace=pace,
+                insert_lunch=True,
+                lunch_time="13:00",
+                lunch_finder=lunch_finder
+            )
+            flush_distances()   # legs the matrix didn't cover, e.g. to lunch
+            yield d_idx, {"date": the_date, "route": ordered, "schedule": sched}
+    finally:
+        for _, fut, _ in solves.values():
+            fut.cancel()
+
+def assemble_itinerary(city: str, start: date, days: int, pace: str, max_walk_km: float, all_days: List[Dict]) -> Dict:
+    return {
+        "city": city, "days": days, "pace": pace, "start": start.isoformat(),
+        "max_walk_km": max_walk_km,
+        "total_km": round(sum(d["schedule"]["total_walk_km"] for d in all_days), 1),
+        "days_detail": all_days
+    }
+
+def build_itinerary(
+    pois: List[Dict],
+    city: str,
+    start: date,
+    days: int,
+    pace: str,
+    max_walk_km: float,
+    lunch_finder: Optional[Callable] = None,
+    deadline_s: float = PLAN_DEADLINE_S
+) -> Dict:
+    done = dict(iter_days(pois, start, days, pace, lunch_finder, deadline_s))
+    return assemble_itinerary(city, start, days, pace, max_walk_km, [done[i] for i in sorted(done)])
+
+def stream_plan(
+    city: str,
+    interests: List[str],
+    live: bool,
+    start: date,
+    days: int,
+    pace: str,
+    max_walk_km: float,
+    lunch_finder: Optional[Callable] = None,
+    limit: int = 30,
+    deadline_s: float = PLAN_DEADLINE_S,
+    bias: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """
+    The whole Generate pipeline as a stream of events:
+      {"type": "pois", "pois": [...]}            each retrieved batch
+      {"type": "days", "dates": [...]}           once retrieval is done and routing starts
+      {"type": "day", "index": i, "day": {...}}  each day as soon as it's scheduled
+      {"type": "done", "itinerary": {...} | None, "pois": [...]}
+    """
+    pois: List[Dict] = []
+    for batch in iter_pois(city, interests, live, limit, bias):
+        pois.extend(batch)
+        yield {"type": "pois", "pois": batch}
+    if not pois:
+        yield {"type": "done", "itinerary": None, "pois": pois}
+        return
+
+    n_days = len(split_days(pois, days))
+    yield {"type": "days", "dates": [(start + timedelta(days=i)).isoformat() for i in range(n_days)]}
+
+    done: Dict[int, Dict] = {}
+    days_iter = iter_days(pois, start, days, pace, lunch_finder, deadline_s)
+    try:
+        for d_idx, day in days_iter:
+            done[d_idx] = day
+            yield {"type": "day", "index": d_idx, "day": day}
+    finally:
+        days_iter.close()
+    itin = assemble_itinerary(city, start, days, pace, max_walk_km, [done[i] for i in sorted(done)])
+    yield {"type": "done", "itinerary": itin, "pois": pois}
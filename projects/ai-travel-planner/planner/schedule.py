@@ -57,6 +57,18 @@ def _hours_from_details(stop: Dict, date_str: str):
 
     return (open_time, close_time)
 
+def stop_dwell_minutes(stop: Dict, pace: str) -> int:
+    cat = stop.get("category","landmarks")
+    return DEFAULT_DWELL.get(pace, DEFAULT_DWELL["normal"]).get(cat, 60)
+
+def stop_window(stop: Dict, date_str: str):
+    """Opening ("HH:MM", "HH:MM") for this date: Place Details if present, else category default."""
+    det = _hours_from_details(stop, date_str)
+    if det:
+        return det
+    cat = stop.get("category","landmarks")
+    return DEFAULT_WINDOWS.get(cat, ("09:00","19:00"))
+
 def schedule_day(
     date_str: str,
     ordered_stops: List[Dict],
@@ -74,18 +86,10 @@ def schedule_day(
     lunch_dt = datetime.fromisoformat(f"{date_str} {lunch_time}:00")
 
     def dwell_minutes(stop):
-        cat = stop.get("category","landmarks")
-        return DEFAULT_DWELL.get(pace, DEFAULT_DWELL["normal"]).get(cat, 60)
+        return stop_dwell_minutes(stop, pace)
 
     def window_for(stop):
-        # If hours from details exist, use them
-        det = _hours_from_details(stop, date_str)
-        if det:
-            open_s, open_e = det
-        else:
-            cat = stop.get("category","landmarks")
-            open_s, open_e = DEFAULT_WINDOWS.get(cat, ("09:00","19:00"))
-
+        open_s, open_e = stop_window(stop, date_str)
         oh, om = parse_hhmm(open_s)
         eh, em = parse_hhmm(open_e)
         open_dt = datetime.fromisoformat(f"{date_str} {oh:02d}:{om:02d}:00")
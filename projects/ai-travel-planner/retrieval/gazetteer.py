@@ -0,0 +1,392 @@
+"""
+Offline gazetteer: city names, aliases, country, centroid, bounding box and
+population, with prefix and typo-tolerant autocomplete. No network needed.
+
+The bundled file (gazetteer.tsv.gz) is gzip text, format version 2:
+
+    #gazetteer  2  <n_places>  <n_keys>
+    id  name  country  region  lat  lng  south  west  north  east  population  alias;alias   (n_places rows, most populous first)
+    key  place_index                                                                        (n_keys rows, sorted by key)
+
+id is the GeoNames id (empty for curated places) and region the first-level
+division ("Illinois", or its code "IL" when built without admin1 names), so
+places sharing a name can be told apart and found again from a link.
+
+Keys are normalized names/aliases (see normalize), so a prefix lookup is a
+binary search plus a short scan. The bundled data is GeoNames cities15000
+(https://download.geonames.org/export/dump/, CC BY 4.0) with the curated
+aliases in gazetteer_extra.csv merged on top. Rebuild it (or a bigger one from
+cities1000.txt) with:
+
+    python -m retrieval.gazetteer build cities15000.txt [--admin1 admin1CodesASCII.txt]
+"""
+import bisect, functools, gzip, heapq, math, sys, threading, unicodedata
+from pathlib import Path
+from typing import List, Dict, Optional, Iterable, Tuple
+
+DATA_FILE = Path(__file__).with_name("gazetteer.tsv.gz")
+EXTRA_FILE = Path(__file__).with_name("gazetteer_extra.csv")
+FORMAT_VERSION = 2
+
+SHORT_PREFIX = 3   # prefixes up to this length are answered from a precomputed table
+TOP_PER_PREFIX = 10
+FUZZY_LEN = 5      # typo matching compares the first FUZZY_LEN characters
+FUZZY_POSTINGS = 32  # keys kept per deletion variant (most populous first); bounds work per query
+
+# GeoNames alternatenames include administrative forms ("Municipio de Middletown",
+# "London Borough of Brent"); as aliases they make "munich" or "london" match
+# unrelated places, so the builder drops them
+ADMIN_WORDS = {"municipio", "municipality", "municipal", "municipalite", "borough", "district", "distrito",
+               "distretto", "prefecture", "county", "township", "arrondissement", "amphoe", "changwat",
+               "comune", "gemeinde", "kommune", "landkreis", "bezirk", "okrug", "rayon", "raion", "obshtina",
+               "opshtina", "opstina", "keruelet", "kerulet", "kabupaten", "kecamatan", "provincia", "province"}
+ADMIN_PREFIXES = ("city of ", "town of ", "village of ", "lungsod ng ", "dakbayan sa ", "bayan ng ", "thanh pho ")
+
+def normalize(s: str) -> str:
+    """Lowercase, strip accents and punctuation: "São Paulo" -> "sao paulo"."""
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(c for c in s if not unicodedata.combining(c)).lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in s).split())
+
+def _deletes(s: str) -> set:
+    return {s} | {s[:i] + s[i+1:] for i in range(len(s))}
+
+def _prefix_distances(q: str, heads: List[str], max_dist: int) -> Dict[str, int]:
+    """
+    For each head, the fewest edits (insert/delete/substitute/adjacent swap)
+    turning q into some prefix of it, capped at max_dist + 1. Heads are walked
+    in sorted order like a trie, so the edit-distance rows for a shared prefix
+    are computed once; only the band |i - j| <= max_dist is filled, and a head
+    stops as soon as no longer prefix of it can do better (a row's minimum
+    never drops further down the table).
+    """
+    over, n = max_dist + 1, len(q)
+    width = n + max_dist
+    # Per key position j: the band of q positions to fill, and a fresh row
+    bands = [range(max(1, j - max_dist), min(n, j + max_dist) + 1) for j in range(width + 1)]
+    blank = [[j if j <= max_dist else over] + [over] * n for j in range(width + 1)]
+    rows = [[i if i <= max_dist else over for i in range(n + 1)]]   # rows[j]: q vs head[:j]
+    best = [rows[0][n]]                                               # min of rows[..j][n]
+    out, prev = {}, ""
+    for head in sorted(set(heads)):
+        lcp = 0
+        for a, b in zip(head, prev):
+            if a != b:
+                break
+            lcp += 1
+        del rows[lcp + 1:], best[lcp + 1:]
+        start = len(rows) if min(rows[-1]) < over else len(head) + 1   # branch already dead
+        for j in range(start, len(head) + 1):
+            p, c = rows[-1], head[j-1]
+            p2, c2 = (rows[-2], head[j-2]) if j > 1 else (None, None)
+            cur = blank[j][:]
+            low = cur[0]
+            for i in bands[j]:
+                qc = q[i-1]
+                d = p[i-1] if qc == c else p[i-1] + 1
+                if p[i] < d - 1:
+                    d = p[i] + 1
+                if cur[i-1] < d - 1:
+                    d = cur[i-1] + 1
+                if i > 1 and qc == c2 and q[i-2] == c and p2[i-2] < d - 1:
+                    d = p2[i-2] + 1
+                if d < over:
+                    cur[i] = d
+                    if d < low:
+                        low = d
+            rows.append(cur)
+            b = cur[n] if cur[n] < best[-1] else best[-1]
+            best.append(b)
+            if b <= low:   # includes the whole row being over the limit
+                break
+        out[head] = best[-1]
+        prev = head
+    return out
+
+def is_admin_alias(alias: str) -> bool:
+    """True for administrative forms of a name: "Municipality of Talavera", "Brent District"."""
+    k = normalize(alias)
+    return k.startswith(ADMIN_PREFIXES) or not ADMIN_WORDS.isdisjoint(k.split())
+
+def estimate_bbox(lat: float, lng: float, population: int) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) around a centroid, sized from population (2-40 km radius)."""
+    radius_km = max(2.0, min(40.0, 2.0 + 8.0 * math.sqrt(max(population, 0) / 1e6)))
+    dlat = radius_km / 111.0
+    dlng = radius_km / (111.0 * max(0.1, math.cos(math.radians(lat))))
+    return (round(lat - dlat, 4), round(lng - dlng, 4), round(lat + dlat, 4), round(lng + dlng, 4))
+
+class Gazetteer:
+    def __init__(self, places: List[Tuple], keys: List[str], key_place: List[int]):
+        self.places = places          # (id, name, country, region, lat, lng, s, w, n, e, population, aliases)
+        self.keys = keys              # sorted normalized keys
+        self.key_place = key_place    # keys[i] -> index into places
+        # Autocomplete re-asks the same prefixes on every keystroke/rerun
+        self._suggest_ids = functools.lru_cache(maxsize=4096)(self._suggest_ids_uncached)
+        # Short prefixes match huge ranges of keys; precompute their best places
+        self._top: Dict[str, List[int]] = {}
+        for key, pidx in zip(keys, key_place):
+            for n in range(1, min(SHORT_PREFIX, len(key)) + 1):
+                top = self._top.setdefault(key[:n], [])
+                if pidx not in top and (len(top) < TOP_PER_PREFIX or pidx < top[-1]):
+                    bisect.insort(top, pidx)
+                    del top[TOP_PER_PREFIX:]
+        self._by_id = {p[0]: pidx for pidx, p in enumerate(places) if p[0]}
+        # Symmetric-deletion index over key prefixes, built here so the first
+        # typo in a session isn't the one that pays for it
+        self._fuzzy: Dict[str, List[int]] = {}
+        for ki in sorted(range(len(keys)), key=key_place.__getitem__):
+            for v in _deletes(keys[ki][:FUZZY_LEN]):
+                postings = self._fuzzy.setdefault(v, [])
+                if len(postings) < FUZZY_POSTINGS:
+                    postings.append(ki)
+
+    @classmethod
+    def load(cls, path: Path = DATA_FILE) -> "Gazetteer":
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = f.readline().rstrip("\n").split("\t")
+            if header[0] != "#gazetteer" or int(header[1]) != FORMAT_VERSION:
+                raise ValueError(f"Unsupported gazetteer file: {path}")
+            n_places, n_keys = int(header[2]), int(header[3])
+            places = []
+            for _ in range(n_places):
+                gid, name, cc, region, lat, lng, s, w, n, e, pop, aliases = f.readline().rstrip("\n").split("\t")
+                places.append((gid, name, cc, region, float(lat), float(lng), float(s), float(w), float(n), float(e),
+                               int(pop), aliases))
+            keys, key_place = [], []
+            for _ in range(n_keys):
+                key, pidx = f.readline().rstrip("\n").split("\t")
+                keys.append(key)
+                key_place.append(int(pidx))
+        return cls(places, keys, key_place)
+
+    def __len__(self):
+        return len(self.places)
+
+    def place(self, pidx: int) -> Dict:
+        gid, name, cc, region, lat, lng, s, w, n, e, pop, aliases = self.places[pidx]
+        return {
+            "id": gid, "name": name, "country": cc, "region": region, "lat": lat, "lng": lng,
+            "bbox": (s, w, n, e), "population": pop,
+            "aliases": aliases.split(";") if aliases else [],
+        }
+
+    # ---------- lookups ----------
+    def prefix_search(self, query: str, limit: int = 8) -> List[Dict]:
+        """Places with a name or alias starting with query, most populous first."""
+        return [self.place(p) for p in self._prefix_ids(normalize(query), limit)]
+
+    def fuzzy_search(self, query: str, limit: int = 8) -> List[Dict]:
+        """Places whose name or alias starts with query give or take a typo or two."""
+        return [self.place(p) for p in self._fuzzy_ids(normalize(query), limit)]
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """Autocomplete: prefix matches, or typo-tolerant matches when nothing starts with query."""
+        return [self.place(p) for p in self._suggest_ids(normalize(query), limit)]
+
+    def _prefix_ids(self, q: str, limit: int) -> List[int]:
+        if not q:
+            return []
+        if len(q) <= SHORT_PREFIX:
+            return self._top.get(q, [])[:limit]
+        lo = bisect.bisect_left(self.keys, q)
+        hi = bisect.bisect_left(self.keys, q + "\U0010ffff", lo)
+        return heapq.nsmallest(limit, set(self.key_place[lo:hi]))
+
+    def _fuzzy_ids(self, q: str, limit: int) -> List[int]:
+        if len(q) < FUZZY_LEN:
+            return []
+        candidates = set()
+        for v in _deletes(q[:FUZZY_LEN]):
+            candidates.update(self._fuzzy.get(v, ()))
+        max_dist = 1 if len(q) <= 6 else 2
+        heads = {ki: self.keys[ki][:len(q) + max_dist] for ki in candidates}
+        dist = _prefix_distances(q, list(heads.values()), max_dist)
+        best: Dict[int, int] = {}
+        for ki, head in heads.items():
+            d = dist[head]
+            pidx = self.key_place[ki]
+            if d <= max_dist and d < best.get(pidx, max_dist + 1):
+                best[pidx] = d
+        return sorted(best, key=lambda p: (best[p], p))[:limit]
+
+    def _suggest_ids_uncached(self, q: str, limit: int) -> Tuple[int, ...]:
+        # Near misses only help when the query itself matches nothing; padding real
+        # matches with them ranks unrelated places under the one that was meant
+        return tuple(self._prefix_ids(q, limit) or self._fuzzy_ids(q, limit))
+
+    def resolve(self, name: str, country: Optional[str] = None) -> Optional[Dict]:
+        """Best place for a city name: exact name/alias match (optionally in country), else top suggestion."""
+        q = normalize(name)
+        lo = bisect.bisect_left(self.keys, q)
+        hi = bisect.bisect_right(self.keys, q, lo)
+        for pidx in sorted(set(self.key_place[lo:hi])):
+            if country is None or self.places[pidx][2] == country:
+                return self.place(pidx)
+        matches = self.suggest(name, limit=TOP_PER_PREFIX)
+        matches = [p for p in matches if country is None or p["country"] == country]
+        return matches[0] if matches else None
+
+    def by_id(self, gid: str) -> Optional[Dict]:
+        """Place with this GeoNames id, as stored in share links."""
+        pidx = self._by_id.get(gid) if gid else None
+        return None if pidx is None else self.place(pidx)
+
+# ---------- module-level API ----------
+_GAZ: Optional[Gazetteer] = None
+_GAZ_LOCK = threading.Lock()
+
+def gazetteer() -> Gazetteer:
+    global _GAZ
+    with _GAZ_LOCK:
+        if _GAZ is None:
+            _GAZ = Gazetteer.load()
+        return _GAZ
+
+def suggest(query: str, limit: int = 8) -> List[Dict]:
+    return gazetteer().suggest(query, limit)
+
+def resolve(name: str, country: Optional[str] = None) -> Optional[Dict]:
+    return gazetteer().resolve(name, country)
+
+def by_id(gid: str) -> Optional[Dict]:
+    return gazetteer().by_id(gid)
+
+def place_label(place: Dict) -> str:
+    """"Springfield, Illinois, US"; the region is left out when unknown."""
+    return ", ".join(x for x in (place["name"], place.get("region"), place["country"]) if x)
+
+def place_labels(places: List[Dict]) -> List[str]:
+    """place_label for each place, with coordinates added where two would read the same."""
+    labels = [place_label(p) for p in places]
+    return [f"{lab} ({p['lat']:.2f}, {p['lng']:.2f})" if labels.count(lab) > 1 else lab
+            for lab, p in zip(labels, places)]
+
+def retrieval_bias(place: Dict) -> Dict:
+    """Location bias for Places searches: centroid plus a radius covering the bbox (API max 50 km)."""
+    s, w, n, e = place["bbox"]
+    half_diag_m = math.hypot((n - s) * 111_000 / 2, (e - w) * 111_000 * math.cos(math.radians(place["lat"])) / 2)
+    return {"location": (place["lat"], place["lng"]), "radius_m": int(min(50_000, max(1_000, half_diag_m)))}
+
+# ---------- building ----------
+def write_gazetteer(records: Iterable[Dict], path: Path = DATA_FILE):
+    """
+    records: dicts with name, country, lat, lng, population and optional
+    id, region, aliases (list) and bbox (s, w, n, e). Writes the sorted,
+    indexed file.
+    """
+    places = sorted(records, key=lambda r: (-int(r.get("population") or 0), r["name"]))
+    index = []
+    for pidx, r in enumerate(places):
+        for k in {normalize(x) for x in [r["name"], *r.get("aliases", [])]}:
+            if k:
+                index.append((k, pidx))
+    index.sort()
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=9) as f:
+        f.write(f"#gazetteer\t{FORMAT_VERSION}\t{len(places)}\t{len(index)}\n")
+        for r in places:
+            pop = int(r.get("population") or 0)
+            bbox = r.get("bbox") or estimate_bbox(r["lat"], r["lng"], pop)
+            aliases = ";".join(a.replace(";", ",").replace("\t", " ") for a in r.get("aliases", []) if a)
+            f.write("\t".join([r.get("id", ""), r["name"], r["country"], r.get("region", ""), f"{r['lat']:.4f}", f"{r['lng']:.4f}",
+                               *(f"{x:.4f}" for x in bbox), str(pop), aliases]) + "\n")
+        for k, pidx in index:
+            f.write(f"{k}\t{pidx}\n")
+
+def read_admin1(path: str) -> Dict[str, str]:
+    """GeoNames admin1CodesASCII.txt: "US.IL" -> "Illinois"."""
+    with open(path, encoding="utf-8") as f:
+        return dict(line.split("\t")[:2] for line in f if line.strip())
+
+def read_geonames(path: str, min_population: int = 0, max_aliases: int = 5,
+                  admin1: Optional[Dict[str, str]] = None) -> Iterable[Dict]:
+    """
+    Rows of a GeoNames cities dump (tab-separated, see the dump's readme).
+    admin1 maps "CC.code" to a region name (read_admin1); without it only
+    alphabetic codes ("IL", "ENG") are kept, numeric ones mean nothing to a reader.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 15:
+                continue
+            pop = int(cols[14] or 0)
+            if pop < min_population:
+                continue
+            name, ascii_name = cols[1], cols[2]
+            # alternatenames holds every language and spelling; keep the shortest
+            # capitalized ASCII ones (codes and short forms like "SF", "Tokio"),
+            # which skips most machine transliterations, and no administrative forms
+            seen = {normalize(name), normalize(ascii_name)}
+            alts = []
+            for a in sorted(cols[3].split(","), key=len):
+                k = normalize(a)
+                if (a.isascii() and a[:1].isupper() and len(k) >= 2 and k not in seen and len(alts) < max_aliases
+                        and not is_admin_alias(a)):
+                    seen.add(k)
+                    alts.append(a)
+            aliases = ([ascii_name] if ascii_name != name else []) + alts
+            cc, code = cols[8], cols[10]
+            region = (admin1 or {}).get(f"{cc}.{code}") or (code if code.isalpha() else "")
+            yield {"id": cols[0], "name": name, "country": cc, "region": region,
+                   "lat": float(cols[4]), "lng": float(cols[5]), "population": pop, "aliases": aliases}
+
+def merge_records(base: List[Dict], extra: Iterable[Dict], max_km: float = 50.0) -> List[Dict]:
+    """
+    Fold curated records into base: a match (same country, shared name/alias,
+    within max_km) gains the curated aliases; anything else is added.
+    """
+    by_name: Dict[Tuple[str, str], List[Dict]] = {}
+    for r in base:
+        for k in {normalize(x) for x in [r["name"], *r.get("aliases", [])]}:
+            by_name.setdefault((r["country"], k), []).append(r)
+    for x in extra:
+        keys = {normalize(n) for n in [x["name"], *x.get("aliases", [])]}
+        near = [r for k in keys for r in by_name.get((x["country"], k), [])
+                if math.hypot(r["lat"] - x["lat"], (r["lng"] - x["lng"]) * math.cos(math.radians(x["lat"]))) * 111 <= max_km]
+        if near:
+            target = max(near, key=lambda r: r.get("population") or 0)
+            have = {normalize(n) for n in [target["name"], *target.get("aliases", [])]}
+            target["aliases"] = target.get("aliases", []) + [n for n in [x["name"], *x.get("aliases", [])] if normalize(n) not in have]
+        else:
+            base.append(x)
+    return base
+
+def read_csv(path: str) -> Iterable[Dict]:
+    """Pipe-separated name|aliases|country|lat|lng|population (aliases ;-separated)."""
+    with open(path, encoding="utf-8") as f:
+        next(f, None)
+        for line in f:
+            if not line.strip():
+                continue
+            name, aliases, cc, lat, lng, pop = line.rstrip("\n").split("|")
+            yield {"name": name, "country": cc, "lat": float(lat), "lng": float(lng),
+                   "population": int(pop), "aliases": [a for a in aliases.split(";") if a]}
+
+def main(argv: List[str] = None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Build or query the offline gazetteer")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build gazetteer.tsv.gz from a GeoNames dump or pipe-separated CSV")
+    b.add_argument("source")
+    b.add_argument("--out", default=str(DATA_FILE))
+    b.add_argument("--min-population", type=int, default=0)
+    b.add_argument("--extra", default=str(EXTRA_FILE), help="curated aliases/places CSV merged on top ('' to skip)")
+    b.add_argument("--admin1", default=None, help="GeoNames admin1CodesASCII.txt, for region names instead of codes")
+    q = sub.add_parser("suggest", help="try an autocomplete query")
+    q.add_argument("query")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "build":
+        admin1 = read_admin1(args.admin1) if args.admin1 else None
+        reader = read_csv(args.source) if args.source.endswith(".csv") else read_geonames(args.source, args.min_population, admin1=admin1)
+        records = list(reader)
+        if args.extra:
+            records = merge_records(records, read_csv(args.extra))
+        write_gazetteer(records, Path(args.out))
+        print(f"Wrote {len(records)} places to {args.out}")
+    else:
+        for p in suggest(args.query):
+            print(f"{place_label(p)}  ({p['lat']}, {p['lng']})  pop {p['population']:,}  id {p['id'] or '-'}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,4 +1,6 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+from retrieval.gazetteer import normalize
 
 SAMPLES = {
     "Las Vegas": [
@@ -47,3 +49,8 @@ def get_sample_pois(city: str, interests: list) -> List[Dict]:
         extras = [p for p in items if p not in filtered]
         filtered.extend(extras[: (6 - len(filtered)) ])
     return filtered[:8]
+
+def sample_city(place: Dict) -> Optional[str]:
+    """SAMPLES key for a gazetteer place, matched on its name or aliases ("New York City" -> "New York")."""
+    names = {normalize(n) for n in [place["name"], *place.get("aliases", [])]}
+    return next((c for c in SAMPLES if normalize(c) in names), None)
@@ -1,11 +1,13 @@
 import os, time, requests, json, hashlib
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional
 from pathlib import Path
 
-CACHE_DIR = Path(__file__).resolve().parents[1] / "data"
+CACHE_DIR = Path(os.environ.get("PLANNER_CACHE_DIR") or Path(__file__).resolve().parents[1] / "data")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 API_KEY = os.environ.get("GOOGLE_PLACES_API_KEY") or os.environ.get("GOOGLE_MAPS_API_KEY")
+# Point at a local stand-in (see loadtest/mock_gmaps.py) to avoid burning quota
+BASE_URL = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
 
 INTEREST_TO_QUERY = {
     "landmarks": {"keyword": "landmark OR sightseeing OR historic site"},
@@ -34,25 +36,40 @@ def _cache_write(name: str, data):
     except Exception:
         pass
 
-def get_live_pois(city: str, interests: list, limit: int = 25) -> List[Dict]:
+def iter_live_pois(city: str, interests: list, limit: int = 25, bias: Optional[Dict] = None) -> Iterator[List[Dict]]:
+    """
+    Yield batches of new (de-duplicated) POIs as each interest's search returns,
+    so callers can show results before the whole retrieval finishes.
+    bias ({"location": (lat, lng), "radius_m": int}, see retrieval.gazetteer)
+    keeps results near the intended city when its name is ambiguous.
+    """
     if not API_KEY:
-        return []
-    key = _hash_key({"textsearch": True, "city": city, "interests": interests, "limit": limit})
+        return
+    key_obj = {"textsearch": True, "city": city, "interests": interests, "limit": limit}
+    if bias:
+        key_obj["bias"] = [round(bias["location"][0], 4), round(bias["location"][1], 4), bias["radius_m"]]
+    key = _hash_key(key_obj)
     cache_name = f"places_{key}.json"
     cached = _cache_read(cache_name)
     if cached is not None:
-        return cached
+        yield cached
+        return
 
     results: List[Dict] = []
+    seen = set()
     interests = interests or list(INTEREST_TO_QUERY.keys())
     for interest in interests:
         params = {"query": f"best {interest} in {city}", "key": API_KEY}
         params.update(INTEREST_TO_QUERY.get(interest, {}))
-        url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+        if bias:
+            params["location"] = f"{bias['location'][0]},{bias['location'][1]}"
+            params["radius"] = bias["radius_m"]
+        url = f"{BASE_URL}/maps/api/place/textsearch/json"
         r = requests.get(url, params=params, timeout=15)
         if r.status_code != 200:
             continue
         data = r.json()
+        batch = []
         for item in data.get("results", []):
             poi = {
                 "name": item.get("name"),
@@ -65,19 +82,24 @@ def get_live_pois(city: str, interests: list, limit: int = 25) -> List[Dict]:
                 "address": item.get("formatted_address"),
                 "open_now": item.get("opening_hours",{}).get("open_now") if item.get("opening_hours") else None
             }
-            if poi["name"] and poi["lat"] and poi["lng"]:
+            if not (poi["name"] and poi["lat"] and poi["lng"]):
+                continue
+            # de-dupe by place_id or name
+            k = poi.get("place_id") or poi["name"]
+            if k not in seen and len(results) < limit:
+                seen.add(k)
                 results.append(poi)
+                batch.append(poi)
+        if batch:
+            yield batch
+        if len(results) >= limit:
+            break
         time.sleep(0.2)
 
-    # de-dupe by place_id or name
-    dedup = {}
-    for r_ in results:
-        k = r_.get("place_id") or r_["name"]
-        if k not in dedup:
-            dedup[k] = r_
-    results = list(dedup.values())[:limit]
     _cache_write(cache_name, results)
-    return results
+
+def get_live_pois(city: str, interests: list, limit: int = 25, bias: Optional[Dict] = None) -> List[Dict]:
+    return [p for batch in iter_live_pois(city, interests, limit, bias) for p in batch]
 
 def get_place_details_bulk(place_ids: List[str]) -> Dict[str, Dict]:
     """
@@ -95,7 +117,7 @@ def get_place_details_bulk(place_ids: List[str]) -> Dict[str, Dict]:
             out[pid] = cached
             continue
 
-        url = "https://maps.googleapis.com/maps/api/place/details/json"
+        url = f"{BASE_URL}/maps/api/place/details/json"
         # fields kept minimal to reduce cost/size
         params = {
             "place_id": pid,
@@ -114,7 +136,7 @@ def get_place_details_bulk(place_ids: List[str]) -> Dict[str, Dict]:
 def get_nearby_food(lat: float, lng: float, limit: int = 5) -> List[Dict]:
     if not API_KEY:
         return []
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+    url = f"{BASE_URL}/maps/api/place/nearbysearch/json"
     params = {
         "location": f"{lat},{lng}",
         "radius": 1200,
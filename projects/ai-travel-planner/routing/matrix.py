@@ -1,10 +1,12 @@
-import os, math, json, hashlib, requests, time
+import os, math, json, hashlib, requests, time, threading, atexit
 from pathlib import Path
 
-CACHE_DIR = Path(__file__).resolve().parents[1] / "data"
+CACHE_DIR = Path(os.environ.get("PLANNER_CACHE_DIR") or Path(__file__).resolve().parents[1] / "data")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 GMAPS_KEY = os.environ.get("GOOGLE_PLACES_API_KEY") or os.environ.get("GOOGLE_MAPS_API_KEY")
+BASE_URL = os.environ.get("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+_CACHE_LOCK = threading.Lock()
 
 def haversine_km(a, b) -> float:
     if isinstance(a, dict):
@@ -37,20 +39,64 @@ def _load_cache():
             return {}
     return {}
 
-def _save_cache(cache):
-    try:
-        _cache_file().write_text(json.dumps(cache))
-    except Exception:
-        pass
+_MEM_CACHE = None
+
+def _cache():
+    # Read the file once per process; lookups then stay in memory
+    global _MEM_CACHE
+    if _MEM_CACHE is None:
+        with _CACHE_LOCK:
+            if _MEM_CACHE is None:
+                _MEM_CACHE = _load_cache()
+    return _MEM_CACHE
+
+def _save_entries(entries):
+    # Days are routed concurrently (and other processes may share the file):
+    # merge into the latest file and swap it in atomically so writers don't
+    # drop each other's entries. Callers batch a whole matrix per write.
+    if not entries:
+        return
+    with _CACHE_LOCK:
+        cache = _load_cache()
+        cache.update(entries)
+        _cache().update(cache)
+        try:
+            tmp = _cache_file().with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_text(json.dumps(cache))
+            os.replace(tmp, _cache_file())
+        except Exception:
+            pass
+
+# Single-pair lookups (e.g. lunch legs) are kept here and written in batches
+_PENDING = {}
+FLUSH_EVERY = 50
+
+def _remember(ck, km):
+    cache = _cache()
+    with _CACHE_LOCK:
+        cache[ck] = km
+        _PENDING[ck] = km
+        full = len(_PENDING) >= FLUSH_EVERY
+    if full:
+        flush_distances()
+
+def flush_distances():
+    """Write distances looked up one at a time since the last flush."""
+    with _CACHE_LOCK:
+        entries = dict(_PENDING)
+        _PENDING.clear()
+    _save_entries(entries)
+
+atexit.register(flush_distances)
 
 def distance_km(a, b, mode="walking") -> float:
     if not GMAPS_KEY:
         return haversine_km(a, b)
-    cache = _load_cache()
     ck = _cache_key(a, b, mode)
+    cache = _cache()
     if ck in cache:
         return cache[ck]
-    url = "https://maps.googleapis.com/maps/api/distancematrix/json"
+    url = f"{BASE_URL}/maps/api/distancematrix/json"
     params = {
         "origins": f"{a['lat']},{a['lng']}",
         "destinations": f"{b['lat']},{b['lng']}",
@@ -58,15 +104,65 @@ def distance_km(a, b, mode="walking") -> float:
         "key": GMAPS_KEY
     }
     r = requests.get(url, params=params, timeout=15)
+    time.sleep(0.05)
     if r.status_code != 200:
         return haversine_km(a, b)
-    data = r.json()
+    # Anything but a real answer (OVER_QUERY_LIMIT, ZERO_RESULTS, ...) gets a
+    # straight-line estimate that isn't cached, so a later call can do better
     try:
-        meters = data["rows"][0]["elements"][0]["distance"]["value"]
-        km = meters / 1000.0
+        data = r.json()
+        el = data["rows"][0]["elements"][0]
+        if data.get("status") != "OK" or el.get("status") != "OK":
+            return haversine_km(a, b)
+        km = el["distance"]["value"] / 1000.0
     except Exception:
-        km = haversine_km(a, b)
-    cache[ck] = km
-    _save_cache(cache)
-    time.sleep(0.05)
+        return haversine_km(a, b)
+    _remember(ck, km)
     return km
+
+# Distance Matrix request limits: 25 origins, 25 destinations, 100 elements
+MAX_DIM = 25
+MAX_ELEMENTS = 100
+
+def prefetch_distances(nodes, mode="walking"):
+    """
+    Fill the distance cache for every ordered pair of nodes with as few
+    Distance Matrix requests as the API limits allow and a single cache
+    write, so distance_km over these nodes is then a memory lookup.
+    """
+    if not GMAPS_KEY or len(nodes) < 2:
+        return
+    cache = _cache()
+    missing = [i for i, a in enumerate(nodes)
+               if any(i != j and _cache_key(a, b, mode) not in cache for j, b in enumerate(nodes))]
+    if not missing:
+        return
+    url = f"{BASE_URL}/maps/api/distancematrix/json"
+    entries = {}
+    for d0 in range(0, len(nodes), MAX_DIM):
+        dests = nodes[d0:d0 + MAX_DIM]
+        step = max(1, min(MAX_DIM, MAX_ELEMENTS // len(dests)))
+        for o0 in range(0, len(missing), step):
+            origins = [nodes[i] for i in missing[o0:o0 + step]]
+            params = {
+                "origins": "|".join(f"{o['lat']},{o['lng']}" for o in origins),
+                "destinations": "|".join(f"{d['lat']},{d['lng']}" for d in dests),
+                "mode": mode,
+                "key": GMAPS_KEY
+            }
+            r = requests.get(url, params=params, timeout=15)
+            time.sleep(0.05)
+            if r.status_code != 200:
+                continue
+            data = r.json()
+            if data.get("status") != "OK":
+                continue   # e.g. OVER_QUERY_LIMIT: leave uncached, distance_km retries
+            for o, row in zip(origins, data.get("rows", [])):
+                for d, el in zip(dests, row.get("elements", [])):
+                    if o is d or el.get("status") != "OK" or "distance" not in el:
+                        continue
+                    entries[_cache_key(o, d, mode)] = el["distance"]["value"] / 1000.0
+    with _CACHE_LOCK:
+        entries.update(_PENDING)
+        _PENDING.clear()
+    _save_entries(entries)
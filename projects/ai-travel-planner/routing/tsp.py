@@ -1,37 +1,55 @@
-from typing import List, Dict, Callable, Tuple
+from typing import List, Dict, Callable, Tuple, Optional
 from ortools.constraint_solver import pywrapcp, routing_enums_pb2
 
-def tsp_order(stops: List[Dict], distance_fn: Callable, start: Dict) -> Tuple[List[Dict], float]:
-    if not stops:
-        return [], 0.0
-    nodes = [start] + stops
+def distance_matrix(nodes: List[Dict], distance_fn: Callable) -> List[List[int]]:
+    """Pairwise distances in meters, computed once so the solver never calls back into Python."""
     n = len(nodes)
+    return [[0 if i == j else int(distance_fn(nodes[i], nodes[j]) * 1000) for j in range(n)] for i in range(n)]
+
+def path_meters(matrix: List[List[int]], order: List[int]) -> int:
+    """Closed tour length from depot 0 through order and back."""
+    walk = [0] + order + [0]
+    return sum(matrix[a][b] for a, b in zip(walk, walk[1:]))
 
-    def distance_callback(from_index, to_index):
-        a = nodes[from_index]
-        b = nodes[to_index]
-        return int(distance_fn(a, b) * 1000)  # meters
+def solve_order(matrix: List[List[int]], time_limit_s: Optional[float] = None) -> Tuple[List[int], int]:
+    """
+    Solve a single-vehicle tour over a precomputed matrix with node 0 as depot.
+    Returns (node indices excluding the depot, total meters). Plain data in and
+    out so it can run in a worker process. With time_limit_s the solver stops
+    there and returns the best tour found so far; if it found none the input
+    order is kept.
+    """
+    n = len(matrix)
+    if n <= 1:
+        return [], 0
 
     manager = pywrapcp.RoutingIndexManager(n, 1, 0)
     routing = pywrapcp.RoutingModel(manager)
-    cb = routing.RegisterTransitCallback(lambda i,j: distance_callback(manager.IndexToNode(i), manager.IndexToNode(j)))
+    cb = routing.RegisterTransitMatrix(matrix)
     routing.SetArcCostEvaluatorOfAllVehicles(cb)
 
     params = pywrapcp.DefaultRoutingSearchParameters()
     params.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    if time_limit_s is not None:
+        params.time_limit.FromMilliseconds(max(1, int(time_limit_s * 1000)))
 
     sol = routing.SolveWithParameters(params)
     if not sol:
-        return stops, 0.0
+        order = list(range(1, n))
+        return order, path_meters(matrix, order)
 
     index = routing.Start(0)
-    order, total_m = [], 0
+    order = []
     while not routing.IsEnd(index):
         nidx = manager.IndexToNode(index)
-        next_index = sol.Value(routing.NextVar(index))
-        nidx2 = manager.IndexToNode(next_index)
-        total_m += distance_callback(nidx, nidx2)
         if nidx != 0:
-            order.append(nodes[nidx])
-        index = next_index
-    return order, total_m / 1000.0
+            order.append(nidx)
+        index = sol.Value(routing.NextVar(index))
+    return order, path_meters(matrix, order)
+
+def tsp_order(stops: List[Dict], distance_fn: Callable, start: Dict, time_limit_s: Optional[float] = None) -> Tuple[List[Dict], float]:
+    if not stops:
+        return [], 0.0
+    nodes = [start] + stops
+    order, total_m = solve_order(distance_matrix(nodes, distance_fn), time_limit_s)
+    return [nodes[i] for i in order], total_m / 1000.0
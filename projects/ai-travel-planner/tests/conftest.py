@@ -0,0 +1,9 @@
+import os, sys
+from pathlib import Path
+
+# The app runs with its own directory on sys.path (streamlit run app.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+# Plan offline: straight-line distances and sample POIs, no Google calls
+for var in ("GOOGLE_MAPS_API_KEY", "GOOGLE_PLACES_API_KEY"):
+    os.environ.pop(var, None)
@@ -0,0 +1,82 @@
+import random
+
+import numpy as np
+import pytest
+
+from loadtest import mock_gmaps
+from planner.batch import day_arrays, evaluate_orderings, preview_swaps
+from planner.schedule import schedule_day
+from retrieval.places import get_sample_pois
+from routing.matrix import haversine_km
+from utils.itinerary_codec import CATEGORIES
+
+DATES = ["2026-05-04", "2026-05-06", "2026-05-09", "2026-05-10"]   # Mon, Wed, Sat, Sun
+
+def _stops():
+    """Sample POIs (category default hours) mixed with ones carrying Place Details hours."""
+    stops = get_sample_pois("New York", CATEGORIES)
+    center = f"{stops[0]['lat']},{stops[0]['lng']}"
+    for interest in ["landmarks", "museums", "food", "nightlife"]:
+        for item in mock_gmaps.textsearch({"query": f"best {interest} in New York", "location": center})["results"][:3]:
+            loc = item["geometry"]["location"]
+            stops.append({"name": item["name"], "lat": loc["lat"], "lng": loc["lng"], "category": interest,
+                          **mock_gmaps.details({"place_id": item["place_id"]})["result"]})
+    return stops
+
+def _hhmm(minutes) -> str:
+    return f"{int(minutes) // 60:02d}:{int(minutes) % 60:02d}"
+
+def _assert_matches_schedule(res, row, perm, stops, open_min, date_str, pace, day_start):
+    ordered = [stops[i] for i in perm if i >= 0]
+    sched = schedule_day(date_str, ordered, haversine_km, day_start=day_start, pace=pace)
+    lunch = [s for s in sched["stops"] if s["name"] == "Lunch (nearby)"]
+    want = [(s["name"], s["start"], s["end"]) for s in sched["stops"] if s["name"] != "Lunch (nearby)"]
+    # A visit starts on arrival or at opening time, whichever is later
+    got = [(stops[i]["name"], _hhmm(max(res["arrive_min"][row, k], open_min[i])), _hhmm(res["depart_min"][row, k]))
+           for k, i in enumerate(perm) if res["visited"][row, k]]
+    assert got == want
+    assert res["n_visited"][row] == len(want)
+    assert round(float(res["walk_km"][row]), 1) == sched["total_walk_km"]
+    if lunch:
+        assert _hhmm(res["lunch_min"][row]) == lunch[0]["start"]
+    else:
+        assert np.isnan(res["lunch_min"][row])
+
+@pytest.mark.parametrize("date_str", DATES)
+@pytest.mark.parametrize("pace", ["chill", "normal", "packed"])
+def test_random_orderings_match_schedule_day(date_str, pace):
+    stops = _stops()
+    arrays = day_arrays(stops, haversine_km, date_str, pace)
+    rng = random.Random(f"{date_str}-{pace}")
+    perms = []
+    for _ in range(40):
+        k = rng.randint(1, 8)
+        perm = rng.sample(range(len(stops)), k)
+        perms.append(perm + [-1] * (8 - k))   # shorter days padded with empty slots
+    for day_start in ("09:30", "11:15"):
+        res = evaluate_orderings(perms, arrays["travel_min"], arrays["dwell_min"], arrays["open_min"],
+                                 arrays["close_min"], dist_km=arrays["dist_km"], day_start=day_start)
+        for row, perm in enumerate(perms):
+            _assert_matches_schedule(res, row, perm, stops, arrays["open_min"], date_str, pace, day_start)
+
+def test_preview_swaps_rows_match_schedule_day():
+    stops = _stops()
+    route, pool = stops[:5], stops[5:]
+    res = preview_swaps(route, 2, pool, haversine_km, DATES[0], pace="normal")
+    nodes = route + pool
+    open_min = day_arrays(nodes, haversine_km, DATES[0])["open_min"]
+    for row in range(len(pool) + 1):
+        perm = list(range(len(route)))
+        if row:
+            perm[2] = len(route) + row - 1
+        _assert_matches_schedule(res, row, perm, nodes, open_min, DATES[0], "normal", "09:30")
+
+def test_best_prefers_more_stops_then_less_walking():
+    stops = _stops()[:4]
+    arrays = day_arrays(stops, haversine_km, DATES[0])
+    perms = list(map(list, [(0, 1, 2, 3), (3, 2, 1, 0), (0, 2, 1, 3), (1, 0, 3, 2)]))
+    res = evaluate_orderings(perms, arrays["travel_min"], arrays["dwell_min"], arrays["open_min"],
+                             arrays["close_min"], dist_km=arrays["dist_km"])
+    key = lambda r: (-res["n_visited"][r], round(float(res["walk_km"][r]), 3), res["end_min"][r])
+    assert res["best"] == min(range(len(perms)), key=key)
+    assert list(res["order"]) == perms[res["best"]]
@@ -0,0 +1,81 @@
+from datetime import date
+from functools import partial
+
+import pytest
+
+from loadtest import mock_gmaps
+from planner.pipeline import build_itinerary, find_lunch
+from retrieval.places import SAMPLES, get_sample_pois
+from utils.itinerary_codec import CATEGORIES, decode_itinerary, encode_itinerary
+
+START = date(2026, 5, 4)   # a Monday; live places shut on some weekdays
+
+def _plan(pois, city, days=2, pace="normal", lunch_finder=None):
+    lunch_finder = lunch_finder or partial(find_lunch, pois=pois, live=False)
+    return build_itinerary(pois, city, START, days, pace, 12, lunch_finder=lunch_finder, deadline_s=1.0)
+
+def _live_pois(city, interests):
+    """Google-shaped POIs (as places_google builds them) with Place Details hours."""
+    pois = []
+    for interest in interests:
+        for item in mock_gmaps.textsearch({"query": f"best {interest} in {city}"})["results"][:4]:
+            loc = item["geometry"]["location"]
+            pois.append({
+                "name": item["name"], "lat": loc["lat"], "lng": loc["lng"], "category": interest,
+                "rating": item["rating"], "price_level": item["price_level"], "place_id": item["place_id"],
+                "address": item["formatted_address"], "open_now": item["opening_hours"]["open_now"],
+                **mock_gmaps.details({"place_id": item["place_id"]})["result"],
+            })
+    return pois
+
+def _nearby_lunch(prev_stop):
+    """A lunch pick from outside the POI pool, like a live Nearby Search."""
+    if not prev_stop:
+        return None
+    it = mock_gmaps.nearbysearch({"location": f"{prev_stop['lat']},{prev_stop['lng']}"})["results"][0]
+    return {"name": it["name"], "lat": it["geometry"]["location"]["lat"],
+            "lng": it["geometry"]["location"]["lng"], "category": "food", "rating": it["rating"]}
+
+def _assert_round_trip(itin, pois):
+    back, pool = decode_itinerary(encode_itinerary(itin, pois))
+    for key in ("city", "days", "pace", "start", "max_walk_km", "total_km"):
+        assert back[key] == itin[key]
+    assert [p["name"] for p in pool] == [p["name"] for p in pois]
+    assert len(back["days_detail"]) == len(itin["days_detail"])
+    for got, want in zip(back["days_detail"], itin["days_detail"]):
+        assert got["date"] == want["date"]
+        assert got["schedule"] == want["schedule"]
+        assert [p["name"] for p in got["route"]] == [p["name"] for p in want["route"]]
+        for p, q in zip(got["route"], want["route"]):
+            assert (p["lat"], p["lng"]) == pytest.approx((q["lat"], q["lng"]), abs=1e-5)
+            assert (p.get("opening_hours") or {}).get("periods") == (q.get("opening_hours") or {}).get("periods")
+    return back
+
+@pytest.mark.parametrize("city", list(SAMPLES))
+def test_sample_plan_round_trips(city):
+    pois = get_sample_pois(city, CATEGORIES)
+    _assert_round_trip(_plan(pois, city), pois)
+
+@pytest.mark.parametrize("pace", ["chill", "packed"])
+def test_live_plan_round_trips(pace):
+    pois = _live_pois("Lisbon", ["landmarks", "museums", "food", "views"])
+    itin = _plan(pois, "Lisbon", days=3, pace=pace, lunch_finder=_nearby_lunch)
+    lunches = [s for d in itin["days_detail"] for s in d["schedule"]["stops"] if s["name"].startswith("Corner")]
+    assert lunches, "expected a lunch stop from outside the pool"
+    _assert_round_trip(itin, pois)
+
+def test_swapped_day_round_trips():
+    # After a swap the route can hold a place that isn't in the retrieved pool
+    pois = get_sample_pois("Tokyo", CATEGORIES)
+    itin = _plan(pois, "Tokyo")
+    extra = dict(pois[0], name="Somewhere Else", lat=pois[0]["lat"] + 0.01)
+    itin["days_detail"][0]["route"][0] = extra
+    back = _assert_round_trip(itin, pois)
+    assert back["days_detail"][0]["route"][0]["name"] == "Somewhere Else"
+
+def test_rejects_bad_tokens():
+    token = encode_itinerary(_plan(get_sample_pois("Chicago", CATEGORIES), "Chicago"))
+    # truncated, and a version byte this build doesn't know
+    for bad in ("", "not a token", token[:10], "B" + token[1:]):
+        with pytest.raises(ValueError):
+            decode_itinerary(bad)
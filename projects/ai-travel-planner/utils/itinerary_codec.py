@@ -0,0 +1,322 @@
+"""
+Compact, URL-safe encoding of a built itinerary.
+
+Layout (version 1): one version byte, then a zlib-compressed body of varints
+and length-prefixed UTF-8 strings:
+
+    header   city, start date, days, pace, walk limit, trip km
+    poi table  every POI once (name, category, lat/lng as 1e-5 deltas from the
+               previous entry, rating, place_id, opening periods); the first
+               `pool` entries are the retrieved POIs, the rest route-only
+    days     per day: route as POI ids, stops and legs as POI ids (or free
+             text for lunch picks) with times delta-encoded in minutes
+
+Only the fields the planner reads are kept, so a decoded plan renders, swaps
+and exports exactly like the original without re-running retrieval or routing.
+"""
+import base64, zlib
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+VERSION = 1
+CATEGORIES = ["landmarks", "museums", "nature", "food", "views", "nightlife"]
+PACES = ["chill", "normal", "packed"]
+COORD_SCALE = 100_000  # ~1 m
+_CUSTOM = len(CATEGORIES) + 1
+
+# ---------- primitives ----------
+def _zz(n: int) -> int:
+    return (n << 1) ^ (n >> 63)
+
+def _unzz(n: int) -> int:
+    return (n >> 1) ^ -(n & 1)
+
+class _Writer:
+    def __init__(self):
+        self.buf = bytearray()
+
+    def uint(self, n: int):
+        if n < 0:
+            raise ValueError(f"negative value in unsigned field: {n}")
+        while n >= 0x80:
+            self.buf.append((n & 0x7F) | 0x80)
+            n >>= 7
+        self.buf.append(n)
+
+    def sint(self, n: int):
+        self.uint(_zz(n))
+
+    def str(self, s: Optional[str]):
+        raw = (s or "").encode("utf-8")
+        self.uint(len(raw))
+        self.buf += raw
+
+    def cat(self, c: Optional[str]):
+        if not c:
+            self.uint(0)
+        elif c in CATEGORIES:
+            self.uint(CATEGORIES.index(c) + 1)
+        else:
+            self.uint(_CUSTOM)
+            self.str(c)
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data, self.pos = data, 0
+
+    def uint(self) -> int:
+        n = shift = 0
+        while True:
+            b = self.data[self.pos]
+            self.pos += 1
+            n |= (b & 0x7F) << shift
+            if b < 0x80:
+                return n
+            shift += 7
+
+    def sint(self) -> int:
+        return _unzz(self.uint())
+
+    def str(self) -> str:
+        n = self.uint()
+        raw = self.data[self.pos:self.pos + n]
+        if len(raw) != n:
+            raise IndexError("truncated string")
+        self.pos += n
+        return raw.decode("utf-8")
+
+    def cat(self) -> Optional[str]:
+        code = self.uint()
+        if code == 0:
+            return None
+        if code == _CUSTOM:
+            return self.str()
+        return CATEGORIES[code - 1]
+
+def _minutes(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+def _hhmm(minutes: int) -> str:
+    minutes %= 24 * 60
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def _tenths(x) -> int:
+    return int(round(float(x or 0) * 10))
+
+def _poi_key(p: Dict):
+    return p.get("place_id") or (p.get("name"), round(p["lat"], 5), round(p["lng"], 5))
+
+# ---------- POI table ----------
+def _write_poi(w: _Writer, p: Dict, prev: Tuple[int, int]) -> Tuple[int, int]:
+    lat, lng = int(round(p["lat"] * COORD_SCALE)), int(round(p["lng"] * COORD_SCALE))
+    w.str(p.get("name"))
+    w.cat(p.get("category"))
+    w.sint(lat - prev[0])
+    w.sint(lng - prev[1])
+    w.uint(_tenths(p.get("rating")))
+    w.str(p.get("place_id"))
+    periods = (p.get("opening_hours") or {}).get("periods") or []
+    w.uint(len(periods))
+    for per in periods:
+        op, cl = per.get("open") or {}, per.get("close")
+        w.uint(int(op.get("day", 0)))
+        w.uint(_minutes(_google_hhmm(op.get("time", "0900"))))
+        w.uint(_minutes(_google_hhmm(cl["time"])) + 1 if cl and cl.get("time") else 0)
+    return lat, lng
+
+def _read_poi(r: _Reader, prev: Tuple[int, int]) -> Tuple[Dict, Tuple[int, int]]:
+    name, category = r.str(), r.cat()
+    lat, lng = prev[0] + r.sint(), prev[1] + r.sint()
+    p = {"name": name, "category": category, "lat": lat / COORD_SCALE, "lng": lng / COORD_SCALE}
+    rating = r.uint()
+    if rating:
+        p["rating"] = rating / 10
+    pid = r.str()
+    if pid:
+        p["place_id"] = pid
+    n_periods = r.uint()
+    if n_periods:
+        periods = []
+        for _ in range(n_periods):
+            day, open_min, close_min = r.uint(), r.uint(), r.uint()
+            per = {"open": {"day": day, "time": _hhmm(open_min).replace(":", "")}}
+            if close_min:
+                per["close"] = {"day": day, "time": _hhmm(close_min - 1).replace(":", "")}
+            periods.append(per)
+        p["opening_hours"] = {"periods": periods}
+    return p, (lat, lng)
+
+def _google_hhmm(t: str) -> str:
+    t = str(t).zfill(4)
+    return f"{t[:2]}:{t[2:]}"
+
+# ---------- stops & legs ----------
+def _write_ref(w: _Writer, name: str, names: Dict[str, int]):
+    idx = names.get(name)
+    if idx is None:
+        w.uint(0)
+        w.str(name)
+    else:
+        w.uint(idx + 1)
+
+def _read_ref(r: _Reader, table: List[Dict]) -> str:
+    idx = r.uint()
+    return r.str() if idx == 0 else table[idx - 1]["name"]
+
+def _write_schedule(w: _Writer, sched: Dict, names: Dict[str, int], table: List[Dict]):
+    stops = sched.get("stops", [])
+    w.uint(len(stops))
+    prev_end = 0
+    for s in stops:
+        idx = names.get(s["name"])
+        if idx is not None and table[idx].get("category") == s.get("category"):
+            w.uint(idx + 1)
+        else:
+            w.uint(0)
+            w.str(s["name"])
+            w.cat(s.get("category"))
+        start, end = _minutes(s["start"]), _minutes(s["end"])
+        dur = (end - start) % (24 * 60)
+        w.sint(start - prev_end)
+        w.uint(dur)
+        w.sint(int(s.get("dwell_min") or 0) - dur)
+        prev_end = start + dur
+
+    legs = sched.get("legs", [])
+    w.uint(len(legs))
+    prev_arrive = 0
+    for leg in legs:
+        _write_ref(w, leg["from"], names)
+        _write_ref(w, leg["to"], names)
+        depart, arrive = _minutes(leg["depart"]), _minutes(leg["arrive"])
+        walk = (arrive - depart) % (24 * 60)
+        w.sint(depart - prev_arrive)
+        w.uint(walk)
+        w.uint(_tenths(leg.get("distance_km")))
+        prev_arrive = depart + walk
+    w.uint(_tenths(sched.get("total_walk_km")))
+
+def _read_schedule(r: _Reader, date_str: str, table: List[Dict]) -> Dict:
+    stops, prev_end = [], 0
+    for _ in range(r.uint()):
+        idx = r.uint()
+        if idx:
+            name, category = table[idx - 1]["name"], table[idx - 1].get("category")
+        else:
+            name, category = r.str(), r.cat()
+        start = prev_end + r.sint()
+        dur = r.uint()
+        dwell = dur + r.sint()
+        stops.append({"name": name, "category": category, "start": _hhmm(start), "end": _hhmm(start + dur), "dwell_min": dwell})
+        prev_end = start + dur
+
+    legs, prev_arrive = [], 0
+    for _ in range(r.uint()):
+        frm, to = _read_ref(r, table), _read_ref(r, table)
+        depart = prev_arrive + r.sint()
+        walk = r.uint()
+        legs.append({
+            "from": frm, "to": to, "depart": _hhmm(depart), "arrive": _hhmm(depart + walk),
+            "distance_km": r.uint() / 10, "mode": "walk"
+        })
+        prev_arrive = depart + walk
+    return {"date": date_str, "legs": legs, "stops": stops, "total_walk_km": r.uint() / 10}
+
+# ---------- public API ----------
+def encode_itinerary(itin: Dict, pois: Optional[List[Dict]] = None) -> str:
+    """
+    Encode an itinerary (as built by planner.pipeline.build_itinerary) plus the
+    POI pool it was built from into a compressed, URL-safe token.
+    """
+    table: List[Dict] = []
+    ids: Dict = {}
+    def add(p: Dict) -> int:
+        k = _poi_key(p)
+        if k not in ids:
+            ids[k] = len(table)
+            table.append(p)
+        return ids[k]
+
+    for p in pois or []:
+        add(p)
+    pool = len(table)
+    routes = [[add(p) for p in day.get("route", [])] for day in itin["days_detail"]]
+
+    w = _Writer()
+    start = date.fromisoformat(itin["start"])
+    w.str(itin["city"])
+    w.uint(start.toordinal())
+    w.uint(int(itin["days"]))
+    pace = itin.get("pace", "normal")
+    w.uint(PACES.index(pace) if pace in PACES else len(PACES))
+    if pace not in PACES:
+        w.str(pace)
+    w.uint(_tenths(itin.get("max_walk_km")))
+    w.uint(_tenths(itin.get("total_km")))
+
+    w.uint(len(table))
+    w.uint(pool)
+    prev = (0, 0)
+    for p in table:
+        prev = _write_poi(w, p, prev)
+
+    w.uint(len(itin["days_detail"]))
+    for day, route in zip(itin["days_detail"], routes):
+        w.uint((date.fromisoformat(day["date"]) - start).days)
+        w.uint(len(route))
+        for idx in route:
+            w.uint(idx)
+        # Resolve names against this day's route first, then the whole table
+        names = {table[i]["name"]: i for i in reversed(range(len(table)))}
+        names.update({table[i]["name"]: i for i in reversed(route)})
+        _write_schedule(w, day["schedule"], names, table)
+
+    raw = bytes([VERSION]) + zlib.compress(bytes(w.buf), 9)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_itinerary(token: str) -> Tuple[Dict, List[Dict]]:
+    """
+    Inverse of encode_itinerary. Returns (itinerary, poi_pool).
+    Raises ValueError for malformed or unsupported tokens.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Not an itinerary token") from e
+    if not raw:
+        raise ValueError("Empty itinerary token")
+    if raw[0] != VERSION:
+        raise ValueError(f"Unsupported itinerary encoding version: {raw[0]}")
+    try:
+        r = _Reader(zlib.decompress(raw[1:]))
+        city = r.str()
+        start = date.fromordinal(r.uint())
+        days = r.uint()
+        pace_idx = r.uint()
+        pace = PACES[pace_idx] if pace_idx < len(PACES) else r.str()
+        max_walk_km = r.uint() / 10
+        total_km = r.uint() / 10
+
+        n, pool = r.uint(), r.uint()
+        table, prev = [], (0, 0)
+        for _ in range(n):
+            p, prev = _read_poi(r, prev)
+            table.append(p)
+
+        days_detail = []
+        for _ in range(r.uint()):
+            the_date = (start + timedelta(days=r.uint())).isoformat()
+            route = [table[r.uint()] for _ in range(r.uint())]
+            days_detail.append({"date": the_date, "route": route, "schedule": _read_schedule(r, the_date, table)})
+    except (zlib.error, IndexError, UnicodeDecodeError, OverflowError) as e:
+        raise ValueError("Corrupt itinerary token") from e
+
+    if max_walk_km == int(max_walk_km):
+        max_walk_km = int(max_walk_km)
+    itin = {
+        "city": city, "days": days, "pace": pace, "start": start.isoformat(),
+        "max_walk_km": max_walk_km, "total_km": total_km,
+        "days_detail": days_detail
+    }
+    return itin, table[:pool]